@@ -1,16 +1,29 @@
 import os
 import asyncio
 import glob
+import socket
+import time
 from lightrag import LightRAG, QueryParam
 from lightrag.utils import EmbeddingFunc
 import numpy as np
 from dotenv import load_dotenv
-from openai import AzureOpenAI
 from lightrag.kg.shared_storage import initialize_pipeline_status
-from datetime import datetime
 import nest_asyncio
 from ..logger import setup_application_logger
-from ..utils.doc_utils import extract_pdf_with_mistral_ocr
+from ..utils.doc_utils import extract_pdf_document, compute_file_sha256, shutdown_text_layer_executor
+from ..utils.db_utils import (
+    get_postgresql_pool,
+    close_postgresql_pool,
+    create_ingestion_ledger_table,
+    fetch_completed_ingestion_hashes,
+    claim_ingestion_document,
+    refresh_ingestion_claims,
+    record_ingestion_ocr,
+    complete_ingestion_documents,
+    fail_ingestion_documents,
+)
+from ..utils.client_utils import get_azure_openai_async_client, close_azure_openai_async_clients
+from ..utils.embedding_utils import get_azure_embedding_engine, get_embedding_cache
 
 nest_asyncio.apply()
 load_dotenv()
@@ -27,6 +40,15 @@ if not os.path.exists(WORKING_DIR):
     os.mkdir(WORKING_DIR)
     logger.info(f"Created working directory: {WORKING_DIR}")
 
+EMBEDDING_MAX_TOKEN_SIZE = 8192
+
+INGEST_OCR_WORKERS = int(os.environ.get("INGEST_OCR_WORKERS", 4))
+INGEST_INSERT_WORKERS = int(os.environ.get("INGEST_INSERT_WORKERS", 1))
+INGEST_INSERT_BATCH_SIZE = int(os.environ.get("INGEST_INSERT_BATCH_SIZE", 4))
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 8))
+INGEST_CLAIM_TIMEOUT = int(os.environ.get("INGEST_CLAIM_TIMEOUT", 3600))
+INGEST_WORKSPACE = os.environ.get("POSTGRES_WORKSPACE") or "default"
+
 
 # ===============================
 # Azure OpenAI Functions
@@ -44,11 +66,7 @@ async def azure_openai_llm_generation(
         if not all([api_key, api_version, endpoint, deployment]):
             raise ValueError("Missing required Azure OpenAI environment variables")
         
-        client = AzureOpenAI(
-            api_key=api_key,
-            api_version=api_version,
-            azure_endpoint=endpoint,
-        )
+        client = get_azure_openai_async_client(api_version, api_key=api_key, endpoint=endpoint)
         
         messages = []
         if system_prompt:
@@ -57,7 +75,7 @@ async def azure_openai_llm_generation(
             messages.extend(history_messages)
         messages.append({"role": "user", "content": prompt})
         
-        chat_completion = client.chat.completions.create(
+        chat_completion = await client.chat.completions.create(
             model=deployment,
             messages=messages,
             temperature=kwargs.get("temperature", 0) if "gpt-5" not in deployment else 1,
@@ -77,28 +95,10 @@ async def azure_openai_llm_generation(
 
 async def azure_openai_embedding_generation(texts: list[str]) -> np.ndarray:
     try:
-        api_key = os.environ.get("AZURE_OPENAI_API_KEY")
-        api_version = os.environ.get("AZURE_EMBEDDING_API_VERSION")
-        endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
-        deployment = os.environ.get("AZURE_EMBEDDING_DEPLOYMENT")
-        
-        if not all([api_key, api_version, endpoint, deployment]):
-            raise ValueError("Missing required Azure OpenAI embedding environment variables")
-        
-        client = AzureOpenAI(
-            api_key=api_key,
-            api_version=api_version,
-            azure_endpoint=endpoint,
-        )
-        
-        embedding = client.embeddings.create(
-            model=deployment, 
-            input=texts
-        )
-        
-        embeddings = [item.embedding for item in embedding.data]
+        engine = get_azure_embedding_engine(max_token_size=EMBEDDING_MAX_TOKEN_SIZE)
+        embeddings = await engine.embed(texts)
         logger.debug(f"Generated embeddings for {len(texts)} texts")
-        return np.array(embeddings)
+        return embeddings
         
     except Exception as e:
         logger.error(f"Error in embedding function: {str(e)}")
@@ -117,13 +117,18 @@ async def initialize_graphrag_with_postgresql():
         if not embedding_dim:
             raise ValueError("Missing AZURE_EMBEDDING_DIMENSION environment variable")
         
+        embedding_cache = get_embedding_cache(
+            embedding_func=azure_openai_embedding_generation,
+            embedding_dim=int(embedding_dim),
+        )
+        
         rag = LightRAG(
             working_dir=WORKING_DIR,
             llm_model_func=azure_openai_llm_generation,
             embedding_func=EmbeddingFunc(
                 embedding_dim=int(embedding_dim),
-                max_token_size=8192,
-                func=azure_openai_embedding_generation,
+                max_token_size=EMBEDDING_MAX_TOKEN_SIZE,
+                func=embedding_cache,
             ),
             kv_storage="PGKVStorage",
             vector_storage="PGVectorStorage", 
@@ -146,9 +151,9 @@ async def initialize_graphrag_with_postgresql():
 # Document Processing Functions
 # ===============================
 
-async def insert_pdf_documents_to_graphrag(rag, directory_path):
-   import csv
-   
+async def insert_pdf_documents_to_graphrag(
+    rag, directory_path, ocr_workers=None, insert_workers=None, insert_batch_size=None, queue_size=None
+):
    try:
        logger.info(f"Processing PDF documents from directory: {directory_path}")
        
@@ -164,55 +169,167 @@ async def insert_pdf_documents_to_graphrag(rag, directory_path):
        
        logger.info(f"Found {len(pdf_files)} PDF files to process")
        
-       csv_file = "/home/bl175/Desktop/Test/policies/pdf_processing_status.csv"
-       csv_exists = os.path.exists(csv_file)
+       pool = await get_postgresql_pool()
+       await create_ingestion_ledger_table(pool)
+       workspace = INGEST_WORKSPACE
+       worker_id = f"{socket.gethostname()}:{os.getpid()}"
        
-       processed_files = set()
-       if csv_exists:
-           with open(csv_file, "r", newline="") as f:
-               reader = csv.DictReader(f)
-               for row in reader:
-                   if row.get("status") == "success":
-                       processed_files.add(row.get("file_name"))
+       file_hashes = await asyncio.gather(*[compute_file_sha256(pdf_file) for pdf_file in pdf_files])
+       completed_hashes = await fetch_completed_ingestion_hashes(pool, workspace, list(set(file_hashes)))
        
-       files_to_process = [pdf_file for pdf_file in pdf_files if os.path.basename(pdf_file) not in processed_files]
+       files_to_process = []
+       seen_hashes = set(completed_hashes)
+       for pdf_file, content_hash in zip(pdf_files, file_hashes):
+           if content_hash not in seen_hashes:
+               seen_hashes.add(content_hash)
+               files_to_process.append((pdf_file, content_hash))
        
        if not files_to_process:
            logger.info("All PDF files have already been processed successfully")
            return True
        
-       logger.info(f"Processing {len(files_to_process)} new PDF files (skipping {len(pdf_files) - len(files_to_process)} already processed)")
+       logger.info(f"Processing {len(files_to_process)} new PDF files (skipping {len(pdf_files) - len(files_to_process)} already processed or duplicate)")
+       
+       embedding_cache = get_embedding_cache()
+       if embedding_cache:
+           embedding_cache.reset_stats()
        
+       ocr_workers = ocr_workers or INGEST_OCR_WORKERS
+       insert_workers = insert_workers or INGEST_INSERT_WORKERS
+       insert_batch_size = insert_batch_size or INGEST_INSERT_BATCH_SIZE
+       queue_size = queue_size or INGEST_QUEUE_SIZE
+       logger.info(
+           f"Ingestion pipeline {worker_id}: {ocr_workers} OCR workers, {insert_workers} insert workers, "
+           f"batch size {insert_batch_size}, queue size {queue_size}"
+       )
+       
+       file_queue = asyncio.Queue()
+       for item in files_to_process:
+           file_queue.put_nowait(item)
+       
+       # Bounded: OCR workers block once queue_size documents are waiting for insertion
+       document_queue = asyncio.Queue(maxsize=queue_size)
        successful_insertions = 0
-       for pdf_file in files_to_process:
-           file_name = os.path.basename(pdf_file)
-           formatted_name = os.path.splitext(file_name)[0].replace(" ", "_")
-           status = "failed"
-           
+       
+       # Ledger writes must not take a worker down: an unreachable ledger is
+       # logged and the pipeline keeps draining its queues
+       async def mark_failed(content_hashes, error_msg):
            try:
-               logger.info(f"Processing document: {file_name}")
+               await fail_ingestion_documents(pool, workspace, content_hashes, worker_id, error_msg)
+           except Exception as e:
+               logger.error(f"Error recording failure of {len(content_hashes)} documents in ledger: {str(e)}")
+       
+       async def ocr_worker():
+           while True:
+               try:
+                   pdf_file, content_hash = file_queue.get_nowait()
+               except asyncio.QueueEmpty:
+                   return
                
-               pdf_content = await extract_pdf_with_mistral_ocr(pdf_file)
-               if pdf_content:
-                   logger.info(f"Inserting document into RAG: {file_name}")
-                   await rag.ainsert([pdf_content], file_paths=[formatted_name])
-                   successful_insertions += 1
-                   status = "success"
-                   logger.info(f"Successfully inserted: {file_name}")
-               else:
-                   logger.error(f"Failed to extract content from: {file_name}")
+               file_name = os.path.basename(pdf_file)
+               formatted_name = os.path.splitext(file_name)[0].replace(" ", "_")
+               try:
+                   claimed = await claim_ingestion_document(
+                       pool, workspace, content_hash, file_name, formatted_name, worker_id, INGEST_CLAIM_TIMEOUT
+                   )
+                   if not claimed:
+                       logger.info(f"Skipping {file_name}: completed or claimed by another worker")
+                       continue
                    
-           except Exception as e:
-               logger.error(f"Error processing {file_name}: {str(e)}")
-           
-           with open(csv_file, "a", newline="") as f:
-               writer = csv.writer(f)
-               if not csv_exists:
-                   writer.writerow(["file_name", "formatted_name", "status", "timestamp"])
-                   csv_exists = True
-               writer.writerow([file_name, formatted_name, status, datetime.now().isoformat()])
+                   logger.info(f"Processing document: {file_name}")
+                   started = time.perf_counter()
+                   document = await extract_pdf_document(pdf_file)
+                   ocr_ms = (time.perf_counter() - started) * 1000
+                   pdf_content = document["markdown"] if document else None
+                   if pdf_content:
+                       await record_ingestion_ocr(pool, workspace, content_hash, worker_id, ocr_ms)
+                       await document_queue.put((file_name, formatted_name, content_hash, pdf_content))
+                       continue
+                   error_msg = "No content extracted"
+                   logger.error(f"Failed to extract content from: {file_name}")
+               except Exception as e:
+                   error_msg = str(e)
+                   logger.error(f"Error processing {file_name}: {str(e)}")
+               await mark_failed([content_hash], error_msg)
+       
+       async def insert_worker():
+           nonlocal successful_insertions
+           done = False
+           while not done:
+               item = await document_queue.get()
+               if item is None:
+                   return
+               batch = [item]
+               while len(batch) < insert_batch_size:
+                   try:
+                       item = document_queue.get_nowait()
+                   except asyncio.QueueEmpty:
+                       break
+                   if item is None:
+                       done = True
+                       break
+                   batch.append(item)
+               
+               file_names = [file_name for file_name, _, _, _ in batch]
+               content_hashes = [content_hash for _, _, content_hash, _ in batch]
+               try:
+                   logger.info(f"Inserting {len(batch)} documents into RAG: {', '.join(file_names)}")
+                   started = time.perf_counter()
+                   await rag.ainsert(
+                       [content for _, _, _, content in batch],
+                       file_paths=[formatted_name for _, formatted_name, _, _ in batch],
+                   )
+                   insert_ms = (time.perf_counter() - started) * 1000
+               except Exception as e:
+                   logger.error(f"Error inserting {', '.join(file_names)}: {str(e)}")
+                   await mark_failed(content_hashes, str(e))
+                   continue
+               logger.info(f"Successfully inserted: {', '.join(file_names)}")
+               
+               # The documents are in RAG; a ledger error here must not mark
+               # them failed, or they would be ingested again
+               try:
+                   await complete_ingestion_documents(
+                       pool, workspace, content_hashes, worker_id, insert_ms
+                   )
+               except Exception as e:
+                   logger.error(f"Error recording completion of {', '.join(file_names)} in ledger: {str(e)}")
+               successful_insertions += len(batch)
+       
+       async def refresh_claims():
+           # Claims expire after INGEST_CLAIM_TIMEOUT; renew them well before
+           while True:
+               await asyncio.sleep(max(INGEST_CLAIM_TIMEOUT / 3, 1))
+               try:
+                   await refresh_ingestion_claims(pool, workspace, worker_id)
+               except Exception as e:
+                   logger.error(f"Error refreshing ingestion claims: {str(e)}")
+       
+       async def run_ocr_stage():
+           try:
+               await asyncio.gather(*[ocr_worker() for _ in range(ocr_workers)])
+           finally:
+               for _ in range(insert_workers):
+                   await document_queue.put(None)
+       
+       claim_refresher = asyncio.create_task(refresh_claims())
+       try:
+           await asyncio.gather(
+               run_ocr_stage(),
+               *[insert_worker() for _ in range(insert_workers)],
+           )
+       finally:
+           claim_refresher.cancel()
+           await asyncio.gather(claim_refresher, return_exceptions=True)
        
        logger.info(f"Successfully inserted {successful_insertions}/{len(files_to_process)} documents")
+       if embedding_cache:
+           stats = embedding_cache.get_stats()
+           logger.info(
+               f"Embedding cache: {stats['requests']} texts, {stats['memory_hits']} memory hits, "
+               f"{stats['persistent_hits']} persistent hits, {stats['misses']} sent to Azure "
+               f"(hit rate {stats['hit_rate']:.1%})"
+           )
        return successful_insertions > 0
        
    except Exception as e:
@@ -235,4 +352,23 @@ async def query_graphrag_with_mode(rag, query_text, mode="hybrid"):
         
     except Exception as e:
         logger.error(f"Error querying RAG: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+
+# ===============================
+# Shutdown Functions
+# ===============================
+
+async def shutdown_graphrag(rag=None):
+    # Call once the RAG instance is done, on the loop that used it, so the
+    # pooled HTTP and PostgreSQL connections are closed instead of leaked
+    try:
+        if rag is not None:
+            await rag.finalize_storages()
+    except Exception as e:
+        logger.error(f"Error finalizing RAG storages: {str(e)}")
+    finally:
+        await close_azure_openai_async_clients()
+        await close_postgresql_pool()
+        shutdown_text_layer_executor()
+        logger.info("GraphRAG shutdown completed")
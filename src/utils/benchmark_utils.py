@@ -0,0 +1,198 @@
+import time
+from ..logger import setup_application_logger
+
+logger = setup_application_logger(__name__)
+
+
+# Column(s) identifying a result row for each vector storage
+VECTOR_RESULT_KEYS = {
+    "entities_vdb": ("entity_name",),
+    "relationships_vdb": ("src_id", "tgt_id"),
+    "chunks_vdb": ("id",),
+}
+
+
+def _result_keys(rows, key_columns):
+    return [tuple(row[column] for column in key_columns) for row in rows or []]
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# ===============================
+# Vector Query Benchmarks
+# ===============================
+
+# Runs every query through each PGVectorStorage in each mode and reports
+# latency plus agreement with the first (reference) mode.
+async def compare_vector_query_modes(rag, queries, top_k=20, doc_ids=None, modes=("legacy", "ann")):
+    reference_mode = modes[0]
+    report = {}
+
+    for storage_name, key_columns in VECTOR_RESULT_KEYS.items():
+        storage = getattr(rag, storage_name)
+        stats = {mode: {"latency_ms": [], "overlap": [], "order_matches": 0} for mode in modes}
+
+        for query in queries:
+            results = {}
+            for mode in modes:
+                started = time.perf_counter()
+                rows = await storage.query(query, top_k, ids=doc_ids, query_mode=mode)
+                stats[mode]["latency_ms"].append((time.perf_counter() - started) * 1000)
+                results[mode] = _result_keys(rows, key_columns)
+
+            reference = results[reference_mode]
+            for mode in modes:
+                if reference:
+                    stats[mode]["overlap"].append(len(set(reference) & set(results[mode])) / len(reference))
+                else:
+                    stats[mode]["overlap"].append(1.0 if not results[mode] else 0.0)
+                if results[mode] == reference:
+                    stats[mode]["order_matches"] += 1
+                elif mode != reference_mode:
+                    logger.warning(
+                        f"{storage_name}: {mode} results differ from {reference_mode} for query {query!r}"
+                    )
+
+        report[storage_name] = {
+            mode: {
+                "mean_latency_ms": sum(s["latency_ms"]) / len(s["latency_ms"]) if s["latency_ms"] else 0.0,
+                "p50_latency_ms": _percentile(s["latency_ms"], 0.5),
+                "p95_latency_ms": _percentile(s["latency_ms"], 0.95),
+                "mean_overlap": sum(s["overlap"]) / len(s["overlap"]) if s["overlap"] else 0.0,
+                "exact_matches": s["order_matches"],
+                "queries": len(queries),
+            }
+            for mode, s in stats.items()
+        }
+        logger.info(f"{storage_name} query mode comparison: {report[storage_name]}")
+
+    return report
+
+
+# Recall@k of the HNSW and quantized/re-ranked paths against an exact scan.
+# The query embedding is computed once per mode but served by the embedding
+# cache after the first call, so latencies reflect the database side.
+async def benchmark_vector_recall(rag, queries, top_k=20, doc_ids=None):
+    report = await compare_vector_query_modes(
+        rag, queries, top_k=top_k, doc_ids=doc_ids, modes=("exact", "ann", "quantized")
+    )
+    for storage_name, modes in report.items():
+        for mode, stats in modes.items():
+            stats[f"recall@{top_k}"] = stats.pop("mean_overlap")
+        logger.info(
+            f"{storage_name} recall@{top_k}: "
+            + ", ".join(
+                f"{mode}={stats[f'recall@{top_k}']:.3f} ({stats['p50_latency_ms']:.1f}ms p50)"
+                for mode, stats in modes.items()
+            )
+        )
+    return report
+
+
+# ===============================
+# Key Filtering Benchmarks
+# ===============================
+
+# Times filter_keys on a KV storage with n_keys synthetic keys mixed with the
+# keys of up to existing_sample stored rows, against the previous IN-literal
+# query with list membership.
+async def benchmark_filter_keys(rag, n_keys=100_000, existing_sample=1000, storage_name="text_chunks"):
+    from lightrag.kg.postgres_impl import namespace_to_table_name
+
+    storage = getattr(rag, storage_name)
+    db = storage.db
+    table_name = namespace_to_table_name(storage.namespace)
+
+    rows = await db.query(
+        f"SELECT id FROM {table_name} WHERE workspace=$1 LIMIT $2",
+        {"workspace": db.workspace, "limit": existing_sample},
+        multirows=True,
+    )
+    existing = {row["id"] for row in rows}
+    keys = existing | {f"benchmark-missing-{i}" for i in range(n_keys - len(existing))}
+
+    started = time.perf_counter()
+    missing = await storage.filter_keys(keys)
+    filter_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    ids = ",".join(f"'{key}'" for key in keys)
+    rows = await db.query(
+        f"SELECT id FROM {table_name} WHERE workspace=$1 AND id IN ({ids})",
+        {"workspace": db.workspace},
+        multirows=True,
+    )
+    exist_keys = [row["id"] for row in rows]
+    legacy_missing = set([key for key in keys if key not in exist_keys])
+    legacy_ms = (time.perf_counter() - started) * 1000
+
+    report = {
+        "keys": len(keys),
+        "existing": len(existing),
+        "filter_keys_ms": filter_ms,
+        "legacy_in_list_ms": legacy_ms,
+        "results_match": missing == legacy_missing,
+    }
+    logger.info(f"{storage_name} filter_keys benchmark: {report}")
+    return report
+
+
+# ===============================
+# Graph Read Benchmarks
+# ===============================
+
+# Per-call latency of the single node/edge graph reads through cypher() and
+# through direct SQL on the label tables (POSTGRES_GRAPH_READ_MODE), checking
+# both paths return the same values. Edges are taken from the nodes' own
+# neighbourhoods.
+async def benchmark_graph_read_modes(rag, node_ids, repeats=3, modes=("cypher", "sql")):
+    graph = rag.chunk_entity_relation_graph
+    edges = []
+    for node_id in node_ids:
+        node_edges = await graph.get_node_edges(node_id) or []
+        edges.extend(node_edges[:1])
+
+    calls = {
+        "has_node": [(graph.has_node, (node_id,)) for node_id in node_ids],
+        "get_node": [(graph.get_node, (node_id,)) for node_id in node_ids],
+        "node_degree": [(graph.node_degree, (node_id,)) for node_id in node_ids],
+        "has_edge": [(graph.has_edge, edge) for edge in edges],
+        "get_edge": [(graph.get_edge, edge) for edge in edges],
+    }
+
+    original_mode = graph.db.graph_read_mode
+    latencies = {mode: {name: [] for name in calls} for mode in modes}
+    results = {mode: {name: [] for name in calls} for mode in modes}
+    try:
+        for mode in modes:
+            graph.db.graph_read_mode = mode
+            for name, invocations in calls.items():
+                for method, args in invocations:
+                    for _ in range(repeats):
+                        started = time.perf_counter()
+                        value = await method(*args)
+                        latencies[mode][name].append((time.perf_counter() - started) * 1000)
+                    results[mode][name].append(value)
+    finally:
+        graph.db.graph_read_mode = original_mode
+
+    reference_mode = modes[0]
+    report = {}
+    for name in calls:
+        report[name] = {
+            mode: {
+                "mean_latency_ms": sum(latencies[mode][name]) / len(latencies[mode][name]) if latencies[mode][name] else 0.0,
+                "p50_latency_ms": _percentile(latencies[mode][name], 0.5),
+                "p95_latency_ms": _percentile(latencies[mode][name], 0.95),
+                "results_match": results[mode][name] == results[reference_mode][name],
+                "calls": len(latencies[mode][name]),
+            }
+            for mode in modes
+        }
+        logger.info(f"graph {name} read modes: {report[name]}")
+    return report
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import httpx
+from openai import AsyncAzureOpenAI
+from ..logger import setup_application_logger
+
+logger = setup_application_logger(__name__)
+
+
+# ===============================
+# HTTP Pool Configuration
+# ===============================
+
+def get_azure_openai_http_limits():
+    return httpx.Limits(
+        max_connections=int(os.environ.get("AZURE_OPENAI_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(os.environ.get("AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20)),
+        keepalive_expiry=float(os.environ.get("AZURE_OPENAI_KEEPALIVE_EXPIRY", 30)),
+    )
+
+
+def get_azure_openai_http_timeout():
+    return httpx.Timeout(
+        float(os.environ.get("AZURE_OPENAI_TIMEOUT", 600)),
+        connect=float(os.environ.get("AZURE_OPENAI_CONNECT_TIMEOUT", 10)),
+    )
+
+
+# ===============================
+# Shared Async Client Functions
+# ===============================
+
+# One client per (endpoint, api_version, api_key), bound to the event loop that
+# created it: httpx connections cannot be reused across loops.
+_async_clients = {}
+
+
+def _discard_stale_client(key):
+    # A client from another event loop cannot be awaited here; close it on its
+    # own loop if that loop still runs, otherwise its connections died with it
+    client_loop, client = _async_clients.pop(key)
+    logger.warning(f"Dropping Azure OpenAI client created on another event loop (api version {key[1]})")
+    if client_loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.close(), client_loop)
+
+
+def get_azure_openai_async_client(api_version, api_key=None, endpoint=None):
+    api_key = api_key or os.environ.get("AZURE_OPENAI_API_KEY")
+    endpoint = endpoint or os.environ.get("AZURE_OPENAI_ENDPOINT")
+
+    if not all([api_key, api_version, endpoint]):
+        raise ValueError("Missing required Azure OpenAI environment variables")
+
+    loop = asyncio.get_running_loop()
+    key = (endpoint, api_version, api_key)
+
+    cached = _async_clients.get(key)
+    if cached is not None:
+        if cached[0] is loop:
+            return cached[1]
+        _discard_stale_client(key)
+
+    http_client = httpx.AsyncClient(
+        limits=get_azure_openai_http_limits(),
+        timeout=get_azure_openai_http_timeout(),
+    )
+    client = AsyncAzureOpenAI(
+        api_key=api_key,
+        api_version=api_version,
+        azure_endpoint=endpoint,
+        http_client=http_client,
+        max_retries=int(os.environ.get("AZURE_OPENAI_MAX_RETRIES", 2)),
+    )
+    _async_clients[key] = (loop, client)
+    logger.info(f"Created pooled Azure OpenAI client for api version {api_version}")
+    return client
+
+
+async def close_azure_openai_async_clients():
+    loop = asyncio.get_running_loop()
+    for key, (client_loop, client) in list(_async_clients.items()):
+        if client_loop is not loop:
+            _discard_stale_client(key)
+            continue
+        del _async_clients[key]
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning(f"Error closing Azure OpenAI client: {str(e)}")
+    logger.info("Closed pooled Azure OpenAI clients")
@@ -23,6 +23,43 @@ def get_postgresql_connection_params():
     }
 
 
+# Pools are bound to the event loop that created them
+_postgresql_pool = None
+
+
+async def get_postgresql_pool():
+    global _postgresql_pool
+    loop = asyncio.get_running_loop()
+    if _postgresql_pool is not None:
+        if _postgresql_pool[0] is loop and not _postgresql_pool[1].is_closing():
+            return _postgresql_pool[1]
+        if _postgresql_pool[0] is not loop:
+            # Its connections belong to the other loop and cannot be closed here
+            logger.warning("Dropping PostgreSQL connection pool created on another event loop")
+        _postgresql_pool = None
+
+    pool = await asyncpg.create_pool(
+        **get_postgresql_connection_params(),
+        min_size=1,
+        max_size=int(os.environ.get("POSTGRES_UTILS_MAX_CONNECTIONS", 5)),
+    )
+    _postgresql_pool = (loop, pool)
+    logger.info("Created PostgreSQL connection pool")
+    return pool
+
+
+async def close_postgresql_pool():
+    global _postgresql_pool
+    if _postgresql_pool is not None:
+        pool_loop, pool = _postgresql_pool
+        _postgresql_pool = None
+        if pool_loop is not asyncio.get_running_loop():
+            logger.warning("Dropping PostgreSQL connection pool created on another event loop")
+            return
+        await pool.close()
+        logger.info("Closed PostgreSQL connection pool")
+
+
 # ===============================
 # Table Management Functions
 # ===============================
@@ -40,7 +77,8 @@ async def clear_all_lightrag_postgresql_tables():
             "LIGHTRAG_LLM_CACHE",
             "LIGHTRAG_DOC_STATUS",
             "LIGHTRAG_FULL_ENTITIES",
-            "LIGHTRAG_FULL_RELATIONS"
+            "LIGHTRAG_FULL_RELATIONS",
+            "LIGHTRAG_INGESTION_LEDGER"
         ]
         
         logger.info("Connecting to database...")
@@ -62,4 +100,166 @@ async def clear_all_lightrag_postgresql_tables():
     finally:
         if 'conn' in locals():
             await conn.close()
-            logger.info("Database connection closed")
\ No newline at end of file
+            logger.info("Database connection closed")
+
+
+# ===============================
+# Embedding Cache Functions
+# ===============================
+
+async def create_embedding_cache_table(pool):
+    await pool.execute("""
+        CREATE TABLE IF NOT EXISTS LIGHTRAG_EMBEDDING_CACHE (
+            model VARCHAR(255) NOT NULL,
+            content_hash CHAR(64) NOT NULL,
+            dimension INTEGER NOT NULL,
+            embedding BYTEA NOT NULL,
+            create_time TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT LIGHTRAG_EMBEDDING_CACHE_PK PRIMARY KEY (model, content_hash)
+        )
+    """)
+
+
+async def fetch_cached_embeddings(pool, model, content_hashes, dimension):
+    rows = await pool.fetch(
+        """SELECT content_hash, embedding FROM LIGHTRAG_EMBEDDING_CACHE
+           WHERE model=$1 AND dimension=$2 AND content_hash = ANY($3::char(64)[])""",
+        model,
+        dimension,
+        content_hashes,
+    )
+    return {row["content_hash"]: row["embedding"] for row in rows}
+
+
+async def store_cached_embeddings(pool, model, dimension, entries):
+    await pool.execute(
+        """INSERT INTO LIGHTRAG_EMBEDDING_CACHE (model, content_hash, dimension, embedding)
+           SELECT $1, h, $2, e FROM unnest($3::char(64)[], $4::bytea[]) AS t(h, e)
+           ON CONFLICT (model, content_hash) DO NOTHING""",
+        model,
+        dimension,
+        [content_hash for content_hash, _ in entries],
+        [embedding for _, embedding in entries],
+    )
+
+
+# ===============================
+# Ingestion Ledger Functions
+# ===============================
+
+async def create_ingestion_ledger_table(pool):
+    await pool.execute("""
+        CREATE TABLE IF NOT EXISTS LIGHTRAG_INGESTION_LEDGER (
+            workspace VARCHAR(255) NOT NULL,
+            content_hash CHAR(64) NOT NULL,
+            file_name TEXT,
+            formatted_name TEXT,
+            status VARCHAR(32) NOT NULL,
+            claimed_by VARCHAR(255) NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            ocr_ms INTEGER NULL,
+            insert_ms INTEGER NULL,
+            error_msg TEXT NULL,
+            claimed_at TIMESTAMP(0) NULL,
+            ocr_completed_at TIMESTAMP(0) NULL,
+            completed_at TIMESTAMP(0) NULL,
+            created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT LIGHTRAG_INGESTION_LEDGER_PK PRIMARY KEY (workspace, content_hash)
+        )
+    """)
+    await pool.execute("""
+        CREATE INDEX IF NOT EXISTS idx_lightrag_ingestion_ledger_workspace_status
+        ON LIGHTRAG_INGESTION_LEDGER (workspace, status)
+    """)
+
+
+async def fetch_completed_ingestion_hashes(pool, workspace, content_hashes):
+    rows = await pool.fetch(
+        """SELECT content_hash FROM LIGHTRAG_INGESTION_LEDGER
+           WHERE workspace=$1 AND status='success' AND content_hash = ANY($2::char(64)[])""",
+        workspace,
+        content_hashes,
+    )
+    return {row["content_hash"] for row in rows}
+
+
+async def claim_ingestion_document(pool, workspace, content_hash, file_name, formatted_name, worker_id, claim_timeout):
+    # A document can be claimed when it is new, failed, or held by a worker
+    # whose claim is older than claim_timeout seconds. The conflicting row is
+    # locked by ON CONFLICT, so concurrent claimants on any host see one winner.
+    row = await pool.fetchrow(
+        """INSERT INTO LIGHTRAG_INGESTION_LEDGER AS ledger
+               (workspace, content_hash, file_name, formatted_name, status, claimed_by, attempts, claimed_at)
+           VALUES ($1, $2, $3, $4, 'processing', $5, 1, CURRENT_TIMESTAMP)
+           ON CONFLICT (workspace, content_hash) DO UPDATE
+           SET status='processing',
+               file_name=EXCLUDED.file_name,
+               formatted_name=EXCLUDED.formatted_name,
+               claimed_by=EXCLUDED.claimed_by,
+               attempts=ledger.attempts + 1,
+               claimed_at=CURRENT_TIMESTAMP,
+               error_msg=NULL,
+               updated_at=CURRENT_TIMESTAMP
+           WHERE ledger.status='failed'
+              OR (ledger.status='processing'
+                  AND ledger.claimed_at < CURRENT_TIMESTAMP - make_interval(secs => $6))
+           RETURNING attempts""",
+        workspace,
+        content_hash,
+        file_name,
+        formatted_name,
+        worker_id,
+        float(claim_timeout),
+    )
+    return row is not None
+
+
+async def refresh_ingestion_claims(pool, workspace, worker_id):
+    # Renews claimed_at on every document this worker still holds, so a long
+    # wait in the queue or a long insert does not let another host reclaim it
+    result = await pool.execute(
+        """UPDATE LIGHTRAG_INGESTION_LEDGER
+           SET claimed_at=CURRENT_TIMESTAMP, updated_at=CURRENT_TIMESTAMP
+           WHERE workspace=$1 AND claimed_by=$2 AND status='processing'""",
+        workspace,
+        worker_id,
+    )
+    return int(result.split()[-1])
+
+
+async def record_ingestion_ocr(pool, workspace, content_hash, worker_id, ocr_ms):
+    await pool.execute(
+        """UPDATE LIGHTRAG_INGESTION_LEDGER
+           SET ocr_ms=$4, ocr_completed_at=CURRENT_TIMESTAMP, updated_at=CURRENT_TIMESTAMP
+           WHERE workspace=$1 AND content_hash=$2 AND claimed_by=$3 AND status='processing'""",
+        workspace,
+        content_hash,
+        worker_id,
+        int(ocr_ms),
+    )
+
+
+async def complete_ingestion_documents(pool, workspace, content_hashes, worker_id, insert_ms):
+    result = await pool.execute(
+        """UPDATE LIGHTRAG_INGESTION_LEDGER
+           SET status='success', insert_ms=$4, completed_at=CURRENT_TIMESTAMP, updated_at=CURRENT_TIMESTAMP
+           WHERE workspace=$1 AND content_hash = ANY($2::char(64)[]) AND claimed_by=$3 AND status='processing'""",
+        workspace,
+        content_hashes,
+        worker_id,
+        int(insert_ms),
+    )
+    return int(result.split()[-1])
+
+
+async def fail_ingestion_documents(pool, workspace, content_hashes, worker_id, error_msg):
+    await pool.execute(
+        """UPDATE LIGHTRAG_INGESTION_LEDGER
+           SET status='failed', error_msg=$4, updated_at=CURRENT_TIMESTAMP
+           WHERE workspace=$1 AND content_hash = ANY($2::char(64)[]) AND claimed_by=$3 AND status='processing'""",
+        workspace,
+        content_hashes,
+        worker_id,
+        error_msg,
+    )
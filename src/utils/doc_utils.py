@@ -1,28 +1,209 @@
-import base64
+import asyncio
+import gzip
+import hashlib
+import json
 import os
-import aiofiles
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from mistralai import Mistral
+from pypdf import PdfReader
 from ..logger import setup_application_logger
 
 logger = setup_application_logger(__name__)
 
+MISTRAL_OCR_MODEL = os.environ.get("MISTRAL_OCR_MODEL", "mistral-ocr-latest")
+MISTRAL_OCR_PAGE_RANGE_SIZE = int(os.environ.get("MISTRAL_OCR_PAGE_RANGE_SIZE", 16))
+MISTRAL_OCR_MAX_CONCURRENCY = int(os.environ.get("MISTRAL_OCR_MAX_CONCURRENCY", 4))
+OCR_CACHE_DIR = os.environ.get("OCR_CACHE_DIR", "./ocr_cache")
+OCR_CACHE_ENABLED = os.environ.get("OCR_CACHE_ENABLED", "true").lower() == "true"
+TEXT_LAYER_ENABLED = os.environ.get("TEXT_LAYER_ENABLED", "true").lower() == "true"
+TEXT_LAYER_MIN_CHARS = int(os.environ.get("TEXT_LAYER_MIN_CHARS", 100))
+TEXT_LAYER_MIN_ALNUM_RATIO = float(os.environ.get("TEXT_LAYER_MIN_ALNUM_RATIO", 0.5))
+TEXT_LAYER_PAGE_RANGE_SIZE = int(os.environ.get("TEXT_LAYER_PAGE_RANGE_SIZE", 32))
+TEXT_LAYER_MAX_WORKERS = int(os.environ.get("TEXT_LAYER_MAX_WORKERS", os.cpu_count() or 1))
+
+
+# ===============================
+# File Hashing Functions
+# ===============================
+
+def _sha256_file(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+async def compute_file_sha256(path):
+    return await asyncio.to_thread(_sha256_file, path)
+
 
 # ===============================
-# PDF Encoding Functions
+# PDF Page Functions
 # ===============================
 
-async def encode_pdf_to_base64(pdf_path):
+def _count_pdf_pages(pdf_path):
+    return len(PdfReader(pdf_path).pages)
+
+
+async def get_pdf_page_count(pdf_path):
+    try:
+        return await asyncio.to_thread(_count_pdf_pages, pdf_path)
+    except Exception as e:
+        logger.warning(f"Could not read page count for {pdf_path}: {str(e)}")
+        return None
+
+
+def _fingerprint_pdf_pages(pdf_path):
+    # A page is identified by its content stream plus the XObjects (scanned
+    # images, forms) it draws, so unchanged pages keep their fingerprint when
+    # other pages of the document are edited.
+    fingerprints = []
+    for page in PdfReader(pdf_path).pages:
+        digest = hashlib.sha256(MISTRAL_OCR_MODEL.encode("utf-8"))
+        digest.update(str(page.rotation).encode("utf-8"))
+        contents = page.get_contents()
+        if contents is not None:
+            digest.update(contents.get_data())
+        resources = page.get("/Resources")
+        xobjects = resources.get_object().get("/XObject") if resources is not None else None
+        if xobjects is not None:
+            xobjects = xobjects.get_object()
+            for name in sorted(xobjects.keys()):
+                digest.update(name.encode("utf-8"))
+                digest.update(xobjects[name].get_object().get_data())
+        fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+
+async def get_pdf_page_fingerprints(pdf_path):
+    try:
+        return await asyncio.to_thread(_fingerprint_pdf_pages, pdf_path)
+    except Exception as e:
+        logger.warning(f"Could not fingerprint pages of {pdf_path}: {str(e)}")
+        return None
+
+
+# ===============================
+# OCR Cache Functions
+# ===============================
+
+def _cache_path(kind, key, suffix):
+    return os.path.join(OCR_CACHE_DIR, kind, key[:2], f"{key}{suffix}")
+
+
+def _read_cache_entry(path):
     try:
-        async with aiofiles.open(pdf_path, "rb") as pdf_file:
-            content = await pdf_file.read()
-            encoded = base64.b64encode(content).decode('utf-8')
-            logger.info(f"Successfully encoded PDF: {pdf_path}")
-            return encoded
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return f.read()
     except FileNotFoundError:
-        logger.error(f"PDF file not found: {pdf_path}")
         return None
+
+
+def _write_cache_entry(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _load_cached_pages(page_hashes):
+    return [_read_cache_entry(_cache_path("pages", h, ".md.gz")) for h in page_hashes]
+
+
+def _store_cached_pages(entries):
+    for page_hash, markdown in entries:
+        _write_cache_entry(_cache_path("pages", page_hash, ".md.gz"), markdown)
+
+
+async def load_cached_ocr_document(content_hash):
+    entry = await asyncio.to_thread(_read_cache_entry, _cache_path("documents", content_hash, ".json.gz"))
+    if entry is None:
+        return None
+    document = json.loads(entry)
+    # Entries written by another OCR model are a miss, not a hit
+    if document.get("model") != MISTRAL_OCR_MODEL:
+        return None
+    page_hashes = document["pages"]
+    page_markdown = await asyncio.to_thread(_load_cached_pages, page_hashes)
+    if any(markdown is None for markdown in page_markdown):
+        return None
+    return page_markdown
+
+
+async def store_cached_ocr_document(content_hash, page_hashes):
+    await asyncio.to_thread(
+        _write_cache_entry,
+        _cache_path("documents", content_hash, ".json.gz"),
+        json.dumps({"model": MISTRAL_OCR_MODEL, "pages": page_hashes}),
+    )
+
+
+async def load_cached_ocr_pages(page_hashes):
+    return await asyncio.to_thread(_load_cached_pages, page_hashes)
+
+
+async def store_cached_ocr_pages(entries):
+    await asyncio.to_thread(_store_cached_pages, entries)
+
+
+# ===============================
+# Text Layer Functions
+# ===============================
+
+_text_layer_executor = None
+
+
+def _get_text_layer_executor():
+    global _text_layer_executor
+    if _text_layer_executor is None:
+        _text_layer_executor = ProcessPoolExecutor(max_workers=TEXT_LAYER_MAX_WORKERS)
+    return _text_layer_executor
+
+
+def shutdown_text_layer_executor():
+    global _text_layer_executor
+    if _text_layer_executor is not None:
+        _text_layer_executor.shutdown(cancel_futures=True)
+        _text_layer_executor = None
+
+
+def _extract_text_layer_range(pdf_path, start, end):
+    # Runs in a worker process; each worker opens its own reader
+    pages = PdfReader(pdf_path).pages
+    return [pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _is_usable_text(text):
+    # Scanned pages have no text layer, and PDFs with broken font maps
+    # produce mostly symbols; both are left to OCR.
+    visible = "".join(text.split())
+    if len(visible) < TEXT_LAYER_MIN_CHARS:
+        return False
+    alnum = sum(1 for char in visible if char.isalnum())
+    return alnum / len(visible) >= TEXT_LAYER_MIN_ALNUM_RATIO
+
+
+async def extract_pdf_text_layer(pdf_path, page_range_size=None):
+    try:
+        page_count = await get_pdf_page_count(pdf_path)
+        if not page_count:
+            return None
+
+        page_range_size = page_range_size or TEXT_LAYER_PAGE_RANGE_SIZE
+        loop = asyncio.get_running_loop()
+        executor = _get_text_layer_executor()
+        results = await asyncio.gather(*[
+            loop.run_in_executor(
+                executor, _extract_text_layer_range, pdf_path, start, min(start + page_range_size, page_count)
+            )
+            for start in range(0, page_count, page_range_size)
+        ])
+        return [text for texts in results for text in texts]
     except Exception as e:
-        logger.error(f"Error encoding PDF {pdf_path}: {str(e)}")
+        logger.warning(f"Could not extract text layer from {pdf_path}: {str(e)}")
         return None
 
 
@@ -30,38 +211,184 @@ async def encode_pdf_to_base64(pdf_path):
 # OCR Processing Functions
 # ===============================
 
-async def extract_pdf_with_mistral_ocr(pdf_path):
+async def upload_pdf_for_ocr(client, pdf_path):
+    # The file handle is streamed by the SDK, so the PDF is never base64-encoded in memory
+    with open(pdf_path, "rb") as pdf_file:
+        uploaded = await client.files.upload_async(
+            file={"file_name": os.path.basename(pdf_path), "content": pdf_file},
+            purpose="ocr",
+        )
+    signed_url = await client.files.get_signed_url_async(file_id=uploaded.id)
+    return uploaded.id, signed_url.url
+
+
+async def stream_pdf_pages_with_mistral_ocr(
+    pdf_path, pages=None, include_images=False, page_range_size=None, max_concurrency=None
+):
+    api_key = os.environ.get("MISTRAL_API_KEY")
+    if not api_key:
+        raise ValueError("MISTRAL_API_KEY environment variable not found")
+
+    page_range_size = page_range_size or MISTRAL_OCR_PAGE_RANGE_SIZE
+    max_concurrency = max_concurrency or MISTRAL_OCR_MAX_CONCURRENCY
+
+    if pages is None:
+        page_count = await get_pdf_page_count(pdf_path)
+        pages = list(range(page_count)) if page_count else None
+    else:
+        pages = sorted(pages)
+        if not pages:
+            return
+
+    # Without a page count the document is sent as a single range
+    if pages is None:
+        page_ranges = [None]
+    else:
+        page_ranges = [pages[i:i + page_range_size] for i in range(0, len(pages), page_range_size)]
+
+    client = Mistral(api_key=api_key)
+    file_id, document_url = await upload_pdf_for_ocr(client, pdf_path)
+
+    async def ocr_page_range(page_range):
+        request = {
+            "model": MISTRAL_OCR_MODEL,
+            "document": {"type": "document_url", "document_url": document_url},
+            "include_image_base64": include_images,
+        }
+        if page_range is not None:
+            request["pages"] = page_range
+        response = await client.ocr.process_async(**request)
+        return response.pages
+
+    # At most max_concurrency ranges are in flight or buffered, and they are
+    # yielded in order, so memory stays near max_concurrency page ranges.
+    pending = deque()
+    next_range = 0
+    try:
+        while next_range < len(page_ranges) or pending:
+            while next_range < len(page_ranges) and len(pending) < max_concurrency:
+                pending.append(asyncio.create_task(ocr_page_range(page_ranges[next_range])))
+                next_range += 1
+
+            for page in await pending.popleft():
+                yield {
+                    "index": page.index,
+                    "markdown": page.markdown,
+                    "images": page.images if include_images else [],
+                }
+                logger.debug(f"Processed page {page.index + 1}")
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        try:
+            await client.files.delete_async(file_id=file_id)
+        except Exception as e:
+            logger.warning(f"Could not delete uploaded OCR file {file_id}: {str(e)}")
+
+
+async def _ocr_pdf_pages(pdf_path, pages=None, use_cache=True):
+    # Returns {page index: (markdown, source)} for the requested pages, or for
+    # every page when pages is None.
+    if not use_cache:
+        return {
+            page["index"]: (page["markdown"], "ocr")
+            async for page in stream_pdf_pages_with_mistral_ocr(pdf_path, pages=pages)
+        }
+
+    content_hash = None
+    if pages is None:
+        content_hash = await compute_file_sha256(pdf_path)
+        cached = await load_cached_ocr_document(content_hash)
+        if cached is not None:
+            logger.info(f"OCR cache hit for {pdf_path} ({len(cached)} pages)")
+            return {i: (markdown, "cache") for i, markdown in enumerate(cached)}
+
+    page_hashes = await get_pdf_page_fingerprints(pdf_path)
+    if not page_hashes:
+        return await _ocr_pdf_pages(pdf_path, pages=pages, use_cache=False)
+
+    wanted = list(range(len(page_hashes))) if pages is None else sorted(pages)
+    cached_markdown = await load_cached_ocr_pages([page_hashes[i] for i in wanted])
+    results = {i: (markdown, "cache") for i, markdown in zip(wanted, cached_markdown) if markdown is not None}
+    missing = [i for i in wanted if i not in results]
+    logger.info(f"OCR cache: {len(results)}/{len(wanted)} pages cached for {pdf_path}")
+
+    if missing:
+        new_entries = []
+        async for page in stream_pdf_pages_with_mistral_ocr(pdf_path, pages=missing):
+            results[page["index"]] = (page["markdown"], "ocr")
+            new_entries.append((page_hashes[page["index"]], page["markdown"]))
+        await store_cached_ocr_pages(new_entries)
+
+    if len(results) < len(wanted):
+        raise ValueError(f"OCR returned no content for some pages of {pdf_path}")
+
+    if content_hash is not None:
+        await store_cached_ocr_document(content_hash, page_hashes)
+    return results
+
+
+def _join_pages(results):
+    # Pages are concatenated as-is, as OCR output always was, so a document
+    # keeps the same content (and LightRAG doc id) whichever path read it
+    return "".join(results[i][0] for i in sorted(results))
+
+
+async def extract_pdf_with_mistral_ocr(pdf_path, use_cache=None):
     try:
         logger.info(f"Starting OCR processing for: {pdf_path}")
         
-        base64_pdf = await encode_pdf_to_base64(pdf_path)
-        if not base64_pdf:
+        if not os.path.exists(pdf_path):
+            logger.error(f"PDF file not found: {pdf_path}")
             return None
         
-        api_key = os.environ.get("MISTRAL_API_KEY")
-        if not api_key:
-            logger.error("MISTRAL_API_KEY environment variable not found")
-            return None
-        
-        client = Mistral(api_key=api_key)
+        use_cache = OCR_CACHE_ENABLED if use_cache is None else use_cache
+        results = await _ocr_pdf_pages(pdf_path, use_cache=use_cache)
         
-        ocr_response = client.ocr.process(
-            model="mistral-ocr-latest",
-            document={
-                "type": "document_url",
-                "document_url": f"data:application/pdf;base64,{base64_pdf}" 
-            },
-            include_image_base64=True
-        )
-        
-        pdf_content = ""
-        for i, page in enumerate(ocr_response.pages):
-            pdf_content += page.markdown
-            logger.debug(f"Processed page {i + 1}")
-        
-        logger.info(f"Successfully extracted content from {len(ocr_response.pages)} pages")
-        return pdf_content
+        logger.info(f"Successfully extracted content from {len(results)} pages")
+        return _join_pages(results)
         
     except Exception as e:
         logger.error(f"Error processing PDF {pdf_path}: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+
+# ===============================
+# Document Extraction Functions
+# ===============================
+
+async def extract_pdf_document(pdf_path, use_cache=None, use_text_layer=None):
+    try:
+        logger.info(f"Starting extraction for: {pdf_path}")
+
+        if not os.path.exists(pdf_path):
+            logger.error(f"PDF file not found: {pdf_path}")
+            return None
+
+        use_cache = OCR_CACHE_ENABLED if use_cache is None else use_cache
+        use_text_layer = TEXT_LAYER_ENABLED if use_text_layer is None else use_text_layer
+
+        texts = await extract_pdf_text_layer(pdf_path) if use_text_layer else None
+        if texts is None:
+            results = await _ocr_pdf_pages(pdf_path, use_cache=use_cache)
+        else:
+            results = {i: (text, "text_layer") for i, text in enumerate(texts) if _is_usable_text(text)}
+            scanned = [i for i in range(len(texts)) if i not in results]
+            if scanned:
+                results.update(await _ocr_pdf_pages(pdf_path, pages=scanned, use_cache=use_cache))
+
+        pages = [{"index": i, "source": results[i][1]} for i in sorted(results)]
+        sources = {}
+        for page in pages:
+            sources[page["source"]] = sources.get(page["source"], 0) + 1
+        logger.info(f"Extracted {len(pages)} pages from {pdf_path}: {sources}")
+
+        return {
+            "markdown": _join_pages(results),
+            "pages": pages,
+        }
+
+    except Exception as e:
+        logger.error(f"Error processing PDF {pdf_path}: {str(e)}")
+        return None
@@ -0,0 +1,252 @@
+import asyncio
+import base64
+import hashlib
+import os
+from collections import OrderedDict
+import numpy as np
+import tiktoken
+from .client_utils import get_azure_openai_async_client
+from .db_utils import (
+    get_postgresql_pool,
+    create_embedding_cache_table,
+    fetch_cached_embeddings,
+    store_cached_embeddings,
+)
+from ..logger import setup_application_logger
+
+logger = setup_application_logger(__name__)
+
+
+# ===============================
+# Azure Embedding Engine
+# ===============================
+
+class AzureEmbeddingEngine:
+    def __init__(
+        self,
+        deployment=None,
+        api_version=None,
+        max_token_size=8192,
+        max_batch_size=None,
+        max_concurrency=None,
+        tokenizer_name=None,
+    ):
+        self.deployment = deployment or os.environ.get("AZURE_EMBEDDING_DEPLOYMENT")
+        self.api_version = api_version or os.environ.get("AZURE_EMBEDDING_API_VERSION")
+
+        if not all([self.deployment, self.api_version]):
+            raise ValueError("Missing required Azure OpenAI embedding environment variables")
+
+        self.max_token_size = max_token_size
+        self.max_batch_size = max_batch_size or int(os.environ.get("AZURE_EMBEDDING_MAX_BATCH_SIZE", 16))
+        self.max_concurrency = max_concurrency or int(os.environ.get("AZURE_EMBEDDING_MAX_CONCURRENCY", 8))
+        self.tokenizer = tiktoken.get_encoding(
+            tokenizer_name or os.environ.get("AZURE_EMBEDDING_TOKENIZER", "cl100k_base")
+        )
+        self._semaphores = {}
+
+    def _get_semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            self._semaphores = {l: s for l, s in self._semaphores.items() if not l.is_closed()}
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _split_text(self, text):
+        tokens = self.tokenizer.encode(text, disallowed_special=())
+        if len(tokens) <= self.max_token_size:
+            return [text], [max(len(tokens), 1)]
+
+        pieces = []
+        weights = []
+        for start in range(0, len(tokens), self.max_token_size):
+            window = tokens[start:start + self.max_token_size]
+            pieces.append(self.tokenizer.decode(window))
+            weights.append(len(window))
+        return pieces, weights
+
+    async def _embed_request(self, texts):
+        client = get_azure_openai_async_client(self.api_version)
+
+        async with self._get_semaphore():
+            response = await client.embeddings.create(
+                model=self.deployment,
+                input=texts,
+                encoding_format="base64",
+            )
+
+        vectors = None
+        for item in response.data:
+            vector = np.frombuffer(base64.b64decode(item.embedding), dtype=np.float32)
+            if vectors is None:
+                vectors = np.empty((len(texts), vector.shape[0]), dtype=np.float32)
+            vectors[item.index] = vector
+        return vectors
+
+    async def embed(self, texts):
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        pieces = []
+        owners = []
+        weights = []
+        for i, text in enumerate(texts):
+            text_pieces, text_weights = self._split_text(text)
+            if len(text_pieces) > 1:
+                logger.debug(f"Split oversized embedding input {i} into {len(text_pieces)} pieces")
+            pieces.extend(text_pieces)
+            weights.extend(text_weights)
+            owners.extend([i] * len(text_pieces))
+
+        batches = [
+            pieces[i:i + self.max_batch_size]
+            for i in range(0, len(pieces), self.max_batch_size)
+        ]
+        results = await asyncio.gather(*[self._embed_request(batch) for batch in batches])
+        piece_vectors = np.concatenate(results) if len(results) > 1 else results[0]
+
+        if len(pieces) == len(texts):
+            return np.ascontiguousarray(piece_vectors, dtype=np.float32)
+
+        # Oversized inputs are represented by the token-weighted mean of their
+        # pieces, re-normalized to unit length like the service output.
+        owners = np.asarray(owners)
+        weights = np.asarray(weights, dtype=np.float32)
+        embeddings = np.zeros((len(texts), piece_vectors.shape[1]), dtype=np.float32)
+        np.add.at(embeddings, owners, piece_vectors * weights[:, None])
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        return embeddings
+
+
+_embedding_engine = None
+
+
+def get_azure_embedding_engine(max_token_size=8192):
+    global _embedding_engine
+    if _embedding_engine is None or _embedding_engine.max_token_size != max_token_size:
+        _embedding_engine = AzureEmbeddingEngine(max_token_size=max_token_size)
+        logger.info(
+            f"Created Azure embedding engine: batch size {_embedding_engine.max_batch_size}, "
+            f"concurrency {_embedding_engine.max_concurrency}, max tokens {max_token_size}"
+        )
+    return _embedding_engine
+
+
+# ===============================
+# Embedding Cache
+# ===============================
+
+class EmbeddingCache:
+    def __init__(self, embedding_func, model_name, embedding_dim, max_memory_items=None, persistent=None):
+        self.embedding_func = embedding_func
+        self.model_name = model_name
+        self.embedding_dim = embedding_dim
+        self.max_memory_items = max_memory_items or int(os.environ.get("EMBEDDING_CACHE_MEMORY_ITEMS", 50000))
+        if persistent is None:
+            persistent = os.environ.get("EMBEDDING_CACHE_PERSISTENT", "true").lower() == "true"
+        self.persistent = persistent
+        self._memory = OrderedDict()
+        self._persistent_ready = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"requests": 0, "memory_hits": 0, "persistent_hits": 0, "misses": 0}
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        hits = stats["memory_hits"] + stats["persistent_hits"]
+        stats["hit_rate"] = hits / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+    def _content_hash(self, text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _remember(self, content_hash, vector):
+        self._memory[content_hash] = vector
+        self._memory.move_to_end(content_hash)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    async def _get_pool(self):
+        pool = await get_postgresql_pool()
+        if not self._persistent_ready:
+            await create_embedding_cache_table(pool)
+            self._persistent_ready = True
+        return pool
+
+    async def _load_persistent(self, content_hashes):
+        try:
+            pool = await self._get_pool()
+            rows = await fetch_cached_embeddings(pool, self.model_name, content_hashes, self.embedding_dim)
+            return {h: np.frombuffer(data, dtype=np.float32) for h, data in rows.items()}
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed, falling back to the model: {str(e)}")
+            return {}
+
+    async def _store_persistent(self, entries):
+        try:
+            pool = await self._get_pool()
+            await store_cached_embeddings(
+                pool,
+                self.model_name,
+                self.embedding_dim,
+                [(h, np.ascontiguousarray(v, dtype=np.float32).tobytes()) for h, v in entries],
+            )
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {str(e)}")
+
+    async def __call__(self, texts, **kwargs):
+        embeddings = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        self.stats["requests"] += len(texts)
+
+        pending = {}
+        for i, text in enumerate(texts):
+            content_hash = self._content_hash(text)
+            vector = self._memory.get(content_hash)
+            if vector is not None:
+                self._memory.move_to_end(content_hash)
+                embeddings[i] = vector
+                self.stats["memory_hits"] += 1
+            else:
+                pending.setdefault(content_hash, []).append(i)
+
+        if pending and self.persistent:
+            stored = await self._load_persistent(list(pending))
+            for content_hash, vector in stored.items():
+                indices = pending.pop(content_hash)
+                embeddings[indices] = vector
+                self._remember(content_hash, vector)
+                self.stats["persistent_hits"] += len(indices)
+
+        if pending:
+            hashes = list(pending)
+            vectors = await self.embedding_func([texts[pending[h][0]] for h in hashes], **kwargs)
+            vectors = np.asarray(vectors, dtype=np.float32)
+            for content_hash, vector in zip(hashes, vectors):
+                embeddings[pending[content_hash]] = vector
+                self._remember(content_hash, vector.copy())
+                self.stats["misses"] += len(pending[content_hash])
+            if self.persistent:
+                await self._store_persistent(list(zip(hashes, vectors)))
+
+        return embeddings
+
+
+_embedding_cache = None
+
+
+def get_embedding_cache(embedding_func=None, model_name=None, embedding_dim=None):
+    global _embedding_cache
+    if _embedding_cache is None:
+        if embedding_func is None or embedding_dim is None:
+            return None
+        _embedding_cache = EmbeddingCache(
+            embedding_func,
+            model_name=model_name or os.environ.get("AZURE_EMBEDDING_DEPLOYMENT"),
+            embedding_dim=embedding_dim,
+        )
+        logger.info(f"Created embedding cache for model {_embedding_cache.model_name}")
+    return _embedding_cache
@@ -3,9 +3,11 @@ import json
 import os
 import re
 import datetime
+import struct
+from contextlib import asynccontextmanager
 from datetime import timezone
 from dataclasses import dataclass, field
-from typing import Any, Union, final
+from typing import Any, AsyncIterator, Union, final
 import numpy as np
 import configparser
 import ssl
@@ -47,6 +49,66 @@ from dotenv import load_dotenv
 load_dotenv(dotenv_path=".env", override=False)
 
 
+try:
+    import orjson  # type: ignore
+
+    def _json_dumps(value: Any) -> str:
+        return orjson.dumps(value).decode()
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+
+def _decode_json_columns(
+    row: dict[str, Any], defaults: dict[str, Any]
+) -> dict[str, Any]:
+    """Normalise the JSON columns of ``row`` in place.
+
+    The json/jsonb codecs already hand back Python objects; text is only
+    parsed for values stored as JSON strings. Malformed or mistyped values
+    are replaced by an empty value of the default's type.
+    """
+    for column, default in defaults.items():
+        if column not in row:
+            continue
+        value = row[column]
+        if isinstance(value, str):
+            try:
+                value = _json_loads(value)
+            except ValueError:
+                value = None
+        if not isinstance(value, type(default)):
+            value = type(default)()
+        row[column] = value
+    return row
+
+
+def _encode_vector(value: Any) -> bytes:
+    """Encode a vector in pgvector's binary format: dim, unused, float4 values."""
+    vector = np.asarray(value, dtype=">f4")
+    return struct.pack(">HH", vector.shape[0], 0) + vector.tobytes()
+
+
+def _decode_vector(data: bytes) -> np.ndarray:
+    dim, _ = struct.unpack_from(">HH", data)
+    return np.frombuffer(data, dtype=">f4", count=dim, offset=4).astype(np.float32)
+
+
+def _version_at_least(version: str | None, minimum: tuple[int, ...]) -> bool:
+    """Compare a dotted extension version such as "0.8.0" with ``minimum``."""
+    if not version:
+        return False
+    parts = []
+    for part in version.split("."):
+        digits = re.match(r"\d+", part)
+        if digits is None:
+            break
+        parts.append(int(digits.group()))
+    return tuple(parts) >= minimum
+
+
 class PostgreSQLDB:
     def __init__(self, config: dict[str, Any], **kwargs: Any):
         self.host = config["host"]
@@ -59,6 +121,58 @@ class PostgreSQLDB:
         self.increment = 1
         self.pool: Pool | None = None
 
+        # Vector index configuration
+        embedding_dim = config.get("embedding_dim")
+        self.embedding_dim = int(embedding_dim) if embedding_dim else None
+        self.vector_index_type = (config.get("vector_index_type") or "hnsw").lower()
+        self.hnsw_m = int(config.get("hnsw_m") or 16)
+        self.hnsw_ef_construction = int(config.get("hnsw_ef_construction") or 64)
+        self.hnsw_ef_search = int(config.get("hnsw_ef_search") or 40)
+        self.ivfflat_lists = int(config.get("ivfflat_lists") or 100)
+        self.ivfflat_probes = int(config.get("ivfflat_probes") or 1)
+        self.vector_query_mode = (config.get("vector_query_mode") or "ann").lower()
+
+        # Keys per filter_keys statement; larger key sets are split
+        self.filter_keys_chunk_size = int(
+            config.get("filter_keys_chunk_size") or 10000
+        )
+        # "cypher" runs single-node/edge graph reads through cypher(); "sql"
+        # reads the base/DIRECTED label tables directly
+        self.graph_read_mode = (config.get("graph_read_mode") or "cypher").lower()
+        if self.graph_read_mode not in ("cypher", "sql"):
+            raise ValueError(
+                f"POSTGRES_GRAPH_READ_MODE must be cypher or sql, got {self.graph_read_mode}"
+            )
+        # "client" drives get_knowledge_graph's BFS from Python one level at a
+        # time; "server" runs it as one recursive CTE over the DIRECTED table
+        self.graph_traversal_mode = (
+            config.get("graph_traversal_mode") or "client"
+        ).lower()
+        if self.graph_traversal_mode not in ("client", "server"):
+            raise ValueError(
+                f"POSTGRES_GRAPH_TRAVERSAL_MODE must be client or server, got {self.graph_traversal_mode}"
+            )
+        # Node ids per statement in the batch graph reads; chunks run concurrently
+        self.graph_read_batch_size = int(config.get("graph_read_batch_size") or 500)
+        # Nodes/edges per UNWIND statement in the batch graph upserts
+        self.graph_upsert_batch_size = int(
+            config.get("graph_upsert_batch_size") or 500
+        )
+
+        # AGE graphs known to exist; create_graph is attempted once per graph
+        self._age_graphs: set[str] = set()
+
+        # Statements are prepared and cached per connection by asyncpg, up to
+        # statement_cache_size distinct SQL texts; statement_stats counts
+        # executions per statement name
+        self.statement_cache_size = int(config.get("statement_cache_size") or 256)
+        self.statement_stats: dict[str, int] = {}
+        # Iterative index scans need pgvector 0.8+; initdb turns this off on
+        # older servers
+        self.vector_iterative_scan = (
+            config.get("vector_iterative_scan") or "relaxed_order"
+        ).lower()
+
         # SSL configuration
         self.ssl_mode = config.get("ssl_mode")
         self.ssl_cert = config.get("ssl_cert")
@@ -150,6 +264,12 @@ class PostgreSQLDB:
                 "port": self.port,
                 "min_size": 1,
                 "max_size": self.max,
+                "statement_cache_size": self.statement_cache_size,
+                # Session default rather than SET, so it survives the RESET ALL
+                # the pool issues when a connection is released. ag_catalog
+                # comes last so unqualified DDL still creates the LightRAG
+                # tables in public; Postgres skips it until AGE is installed.
+                "server_settings": {"search_path": '"$user", public, ag_catalog'},
             }
 
             # Add SSL configuration if provided
@@ -165,11 +285,31 @@ class PostgreSQLDB:
                     connection_params["ssl"] = False
                 logger.info(f"PostgreSQL, SSL mode set to: {self.ssl_mode}")
 
-            self.pool = await asyncpg.create_pool(**connection_params)  # type: ignore
+            self.pool = await asyncpg.create_pool(
+                **connection_params, init=self._init_connection
+            )  # type: ignore
 
             # Ensure VECTOR extension is available
             async with self.pool.acquire() as connection:
                 await self.configure_vector_extension(connection)
+                pgvector_version = await connection.fetchval(
+                    "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+                )
+
+            # hnsw/ivfflat.iterative_scan do not exist before pgvector 0.8,
+            # and setting them fails every filtered query
+            if self.vector_iterative_scan != "off" and not _version_at_least(
+                pgvector_version, (0, 8)
+            ):
+                logger.info(
+                    f"PostgreSQL, pgvector {pgvector_version} has no iterative index scans, "
+                    "POSTGRES_VECTOR_ITERATIVE_SCAN set to off"
+                )
+                self.vector_iterative_scan = "off"
+
+            # Connections opened before the extension existed have no vector
+            # codec; recycle them so every connection registers it.
+            await self.pool.expire_connections()
 
             ssl_status = "with SSL" if connection_params.get("ssl") else "without SSL"
             logger.info(
@@ -181,6 +321,58 @@ class PostgreSQLDB:
             )
             raise
 
+    @staticmethod
+    async def _init_connection(connection: asyncpg.Connection) -> None:
+        """Set up a new pool connection: type codecs and the AGE session.
+
+        Vectors travel as packed float32 in both directions and decode to
+        numpy arrays, instead of being rendered to and parsed from text.
+        """
+        schema = await connection.fetchval(
+            """SELECT n.nspname FROM pg_type t
+               JOIN pg_namespace n ON n.oid = t.typnamespace
+               WHERE t.typname = 'vector'"""
+        )
+        # Without the extension yet, initdb recycles the connection afterwards
+        if schema is not None:
+            await connection.set_type_codec(
+                "vector",
+                schema=schema,
+                encoder=_encode_vector,
+                decoder=_decode_vector,
+                format="binary",
+            )
+
+        # JSON columns are encoded and decoded once, in the driver
+        for json_type in ("json", "jsonb"):
+            await connection.set_type_codec(
+                json_type,
+                schema="pg_catalog",
+                encoder=_json_dumps,
+                decoder=_json_loads,
+                format="text",
+            )
+
+        # Cypher parameters are bound as agtype; values stay in text form,
+        # which is what _record_to_dict parses
+        has_agtype = await connection.fetchval(
+            "SELECT 1 FROM pg_type WHERE typname = 'agtype'"
+        )
+        if has_agtype:
+            try:
+                # Load AGE for the session once instead of relying on the
+                # first cypher() call; not needed with shared_preload_libraries
+                await connection.execute("LOAD 'age'")
+            except asyncpg.exceptions.PostgresError as e:
+                logger.debug(f"PostgreSQL, LOAD 'age' skipped: {e}")
+            await connection.set_type_codec(
+                "agtype",
+                schema="ag_catalog",
+                encoder=str,
+                decoder=str,
+                format="text",
+            )
+
     @staticmethod
     async def configure_vector_extension(connection: asyncpg.Connection) -> None:
         """Create VECTOR extension if it doesn't exist for vector similarity operations."""
@@ -201,20 +393,19 @@ class PostgreSQLDB:
             logger.warning(f"Could not create AGE extension: {e}")
             # Don't raise - let the system continue without AGE extension
 
-    @staticmethod
-    async def configure_age(connection: asyncpg.Connection, graph_name: str) -> None:
-        """Set the Apache AGE environment and creates a graph if it does not exist.
-
-        This method:
-        - Sets the PostgreSQL `search_path` to include `ag_catalog`, ensuring that Apache AGE functions can be used without specifying the schema.
-        - Attempts to create a new graph with the provided `graph_name` if it does not already exist.
-        - Silently ignores errors related to the graph already existing.
+    async def configure_age(
+        self, connection: asyncpg.Connection, graph_name: str
+    ) -> None:
+        """Create the graph ``graph_name`` if this process has not seen it yet.
 
+        The session side of the AGE environment (``search_path`` including
+        ``ag_catalog`` and ``LOAD 'age'``) is set up when a pool connection is
+        opened, so once a graph is recorded this costs no round-trip.
+        Errors about the graph already existing are ignored.
         """
+        if graph_name in self._age_graphs:
+            return
         try:
-            await connection.execute(  # type: ignore
-                'SET search_path = ag_catalog, "$user", public'
-            )
             await connection.execute(  # type: ignore
                 f"select create_graph('{graph_name}')"
             )
@@ -223,6 +414,105 @@ class PostgreSQLDB:
             asyncpg.exceptions.UniqueViolationError,
         ):
             pass
+        self._age_graphs.add(graph_name)
+
+    def _vector_table_ddl(self, ddl: str) -> str:
+        """Give content_vector a fixed dimension when one is configured."""
+        if not self.embedding_dim:
+            return ddl
+        return ddl.replace(
+            "content_vector VECTOR,", f"content_vector VECTOR({self.embedding_dim}),"
+        )
+
+    @property
+    def vector_index_uses_halfvec(self) -> bool:
+        # pgvector indexes at most 2000 dimensions for vector, 4000 for halfvec
+        return bool(self.embedding_dim) and self.embedding_dim > 2000
+
+    def vector_distance_sql(self, param: str) -> str:
+        """Cosine distance expression matching the ANN index definition."""
+        if self.vector_index_uses_halfvec:
+            halfvec = f"halfvec({self.embedding_dim})"
+            return f"content_vector::{halfvec} <=> {param}::{halfvec}"
+        return f"content_vector <=> {param}::vector"
+
+    def quantized_distance_sql(self, quantization: str, param: str) -> str:
+        """Candidate distance on halfvec or binary-quantized vectors."""
+        if quantization == "halfvec":
+            halfvec = f"halfvec({self.embedding_dim})"
+            return f"content_vector::{halfvec} <=> {param}::{halfvec}"
+        if quantization == "binary":
+            bit = f"bit({self.embedding_dim})"
+            return f"binary_quantize(content_vector)::{bit} <~> binary_quantize({param}::vector)::{bit}"
+        raise ValueError(f"Unsupported vector quantization: {quantization}")
+
+    async def create_quantized_vector_index(self, table_name: str, quantization: str) -> None:
+        """Create an HNSW index over the quantized form of content_vector.
+
+        Only the index holds the quantized values; the full-precision column
+        stays in the table and is used to re-rank the candidates. Once the
+        quantized index exists the default cosine index on the table is
+        dropped: quantized searches do not use it, and above 2000 dimensions
+        it would duplicate the halfvec index.
+        """
+        if quantization == "halfvec":
+            column = f"(content_vector::halfvec({self.embedding_dim})) halfvec_cosine_ops"
+        elif quantization == "binary":
+            column = f"(binary_quantize(content_vector)::bit({self.embedding_dim})) bit_hamming_ops"
+        else:
+            raise ValueError(f"Unsupported vector quantization: {quantization}")
+
+        index_name = f"idx_{table_name.lower()}_hnsw_{quantization}"
+        try:
+            existing = await self.query(
+                "SELECT 1 FROM pg_indexes WHERE indexname = $1",
+                {"indexname": index_name},
+            )
+            if not existing:
+                logger.info(
+                    f"PostgreSQL, Creating {quantization} HNSW index {index_name} on {table_name}"
+                )
+                await self.execute(
+                    f"CREATE INDEX {index_name} ON {table_name} USING hnsw ({column}) "
+                    f"WITH (m = {self.hnsw_m}, ef_construction = {self.hnsw_ef_construction})"
+                )
+        except Exception as e:
+            logger.warning(
+                f"PostgreSQL, Failed to create {quantization} index on {table_name}: {e}"
+            )
+            return
+
+        if self.vector_index_type not in ("hnsw", "ivfflat"):
+            return
+        default_index = f"idx_{table_name.lower()}_{self.vector_index_type}_cosine"
+        try:
+            await self.execute(f"DROP INDEX IF EXISTS {default_index}")
+        except Exception as e:
+            logger.warning(
+                f"PostgreSQL, Failed to drop {default_index} on {table_name}: {e}"
+            )
+
+    def vector_search_settings(
+        self, top_k: int, ef_search: int | None = None, filtered: bool = False
+    ) -> dict[str, str]:
+        """Session settings for an ANN query, applied with SET LOCAL semantics.
+
+        Filtered queries enable pgvector's iterative index scan (0.8+), so a
+        selective filter keeps scanning the index instead of returning fewer
+        than top_k rows.
+        """
+        settings: dict[str, str] = {}
+        if self.vector_index_type == "hnsw":
+            # HNSW returns at most ef_search rows, so never search below top_k;
+            # pgvector rejects values above 1000
+            settings["hnsw.ef_search"] = str(
+                min(max(ef_search or self.hnsw_ef_search, top_k), 1000)
+            )
+        elif self.vector_index_type == "ivfflat":
+            settings["ivfflat.probes"] = str(self.ivfflat_probes)
+        if settings and filtered and self.vector_iterative_scan != "off":
+            settings[f"{self.vector_index_type}.iterative_scan"] = self.vector_iterative_scan
+        return settings
 
     async def _migrate_llm_cache_add_columns(self):
         """Add chunk_id and cache_type columns to LIGHTRAG_LLM_CACHE table if they don't exist"""
@@ -797,7 +1087,7 @@ class PostgreSQLDB:
             except Exception:
                 try:
                     logger.info(f"PostgreSQL, Try Creating table {k} in database")
-                    await self.execute(v["ddl"])
+                    await self.execute(self._vector_table_ddl(v["ddl"]))
                     logger.info(
                         f"PostgreSQL, Creation success table {k} in PostgreSQL database"
                     )
@@ -928,6 +1218,127 @@ class PostgreSQLDB:
                 f"PostgreSQL, Failed to create full entities/relations tables: {e}"
             )
 
+        # Type vector columns and build ANN indexes on them
+        try:
+            await self._migrate_vector_dimensions()
+            await self._create_vector_indexes()
+        except Exception as e:
+            logger.error(f"PostgreSQL, Failed to create vector indexes: {e}")
+
+    async def _migrate_vector_dimensions(self):
+        """Convert untyped content_vector columns to VECTOR(embedding_dim)"""
+        if not self.embedding_dim:
+            logger.warning(
+                "PostgreSQL, AZURE_EMBEDDING_DIMENSION not set, vector columns stay untyped and unindexed"
+            )
+            return
+
+        for table_name in VECTOR_TABLES:
+            try:
+                column_info = await self.query(
+                    """
+                    SELECT format_type(a.atttypid, a.atttypmod) AS column_type
+                    FROM pg_attribute a
+                    WHERE a.attrelid = $1::regclass
+                    AND a.attname = 'content_vector'
+                    AND NOT a.attisdropped
+                    """,
+                    {"table_name": table_name.lower()},
+                )
+                if not column_info:
+                    continue
+
+                column_type = column_info["column_type"]
+                if column_type == f"vector({self.embedding_dim})":
+                    continue
+                if column_type != "vector":
+                    logger.warning(
+                        f"PostgreSQL, {table_name}.content_vector is {column_type}, "
+                        f"expected vector({self.embedding_dim}); leaving it unchanged"
+                    )
+                    continue
+
+                mismatched = await self.query(
+                    f"""
+                    SELECT COUNT(*) AS count FROM {table_name}
+                    WHERE vector_dims(content_vector) <> $1
+                    """,
+                    {"embedding_dim": self.embedding_dim},
+                )
+                if mismatched and mismatched["count"]:
+                    logger.warning(
+                        f"PostgreSQL, {table_name} has {mismatched['count']} vectors whose "
+                        f"dimension is not {self.embedding_dim}; skipping type migration"
+                    )
+                    continue
+
+                logger.info(
+                    f"PostgreSQL, Migrating {table_name}.content_vector to vector({self.embedding_dim})"
+                )
+                await self.execute(
+                    f"ALTER TABLE {table_name} ALTER COLUMN content_vector "
+                    f"TYPE VECTOR({self.embedding_dim})"
+                )
+            except Exception as e:
+                logger.warning(
+                    f"PostgreSQL, Failed to migrate vector column of {table_name}: {e}"
+                )
+
+    async def _create_vector_indexes(self):
+        """Create ANN indexes on the LIGHTRAG_VDB_* tables"""
+        if self.vector_index_type not in ("hnsw", "ivfflat"):
+            logger.info("PostgreSQL, Vector index disabled, queries use exact scans")
+            return
+        if not self.embedding_dim:
+            return
+
+        if self.vector_index_uses_halfvec:
+            column = f"(content_vector::halfvec({self.embedding_dim})) halfvec_cosine_ops"
+        else:
+            column = "content_vector vector_cosine_ops"
+
+        if self.vector_index_type == "hnsw":
+            with_clause = f"m = {self.hnsw_m}, ef_construction = {self.hnsw_ef_construction}"
+        else:
+            with_clause = f"lists = {self.ivfflat_lists}"
+
+        for table_name in VECTOR_TABLES:
+            index_name = f"idx_{table_name.lower()}_{self.vector_index_type}_cosine"
+            try:
+                existing = await self.query(
+                    "SELECT 1 FROM pg_indexes WHERE indexname = $1",
+                    {"indexname": index_name},
+                )
+                if existing:
+                    logger.debug(f"Index already exists: {index_name}")
+                    continue
+                # Tables searched through a quantized index (see
+                # create_quantized_vector_index) do not get the default one
+                quantized = await self.query(
+                    "SELECT 1 FROM pg_indexes WHERE indexname = ANY($1::text[])",
+                    {
+                        "indexnames": [
+                            f"idx_{table_name.lower()}_hnsw_{quantization}"
+                            for quantization in ("halfvec", "binary")
+                        ]
+                    },
+                )
+                if quantized:
+                    logger.debug(f"Quantized index exists, skipping {index_name}")
+                    continue
+
+                logger.info(
+                    f"PostgreSQL, Creating {self.vector_index_type} index {index_name} on {table_name}"
+                )
+                await self.execute(
+                    f"CREATE INDEX {index_name} ON {table_name} "
+                    f"USING {self.vector_index_type} ({column}) WITH ({with_clause})"
+                )
+            except Exception as e:
+                logger.warning(
+                    f"PostgreSQL, Failed to create vector index on {table_name}: {e}"
+                )
+
     async def _migrate_create_full_entities_relations_tables(self):
         """Create LIGHTRAG_FULL_ENTITIES and LIGHTRAG_FULL_RELATIONS tables if they don't exist"""
         tables_to_check = [
@@ -1051,6 +1462,22 @@ class PostgreSQLDB:
             except Exception as e:
                 logger.warning(f"Failed to create index {index['name']}: {e}")
 
+    async def _fetch(
+        self,
+        connection: asyncpg.Connection,
+        sql: str,
+        args: tuple,
+        statement: str | None,
+    ) -> list[asyncpg.Record]:
+        statement = statement or SQL_TEMPLATE_NAMES.get(sql)
+        if statement is not None:
+            self.statement_stats[statement] = self.statement_stats.get(statement, 0) + 1
+        return await connection.fetch(sql, *args)
+
+    def get_statement_stats(self) -> dict[str, int]:
+        """Execution counts per statement name."""
+        return dict(self.statement_stats)
+
     async def query(
         self,
         sql: str,
@@ -1058,21 +1485,34 @@ class PostgreSQLDB:
         multirows: bool = False,
         with_age: bool = False,
         graph_name: str | None = None,
+        settings: dict[str, str] | None = None,
+        statement: str | None = None,
     ) -> dict[str, Any] | None | list[dict[str, Any]]:
         # start_time = time.time()
         # logger.info(f"PostgreSQL, Querying:\n{sql}")
 
         async with self.pool.acquire() as connection:  # type: ignore
             if with_age and graph_name:
-                await self.configure_age(connection, graph_name)  # type: ignore
+                await self.configure_age(connection, graph_name)
             elif with_age and not graph_name:
                 raise ValueError("Graph name is required when with_age is True")
 
             try:
-                if params:
-                    rows = await connection.fetch(sql, *params.values())
+                if settings:
+                    # Settings are transaction-local so they never leak to
+                    # the next user of this pooled connection
+                    async with connection.transaction():
+                        for name, value in settings.items():
+                            await connection.execute(
+                                "SELECT set_config($1, $2, true)", name, value
+                            )
+                        rows = await self._fetch(
+                            connection, sql, tuple((params or {}).values()), statement
+                        )
                 else:
-                    rows = await connection.fetch(sql)
+                    rows = await self._fetch(
+                        connection, sql, tuple((params or {}).values()), statement
+                    )
 
                 if multirows:
                     if rows:
@@ -1104,6 +1544,7 @@ class PostgreSQLDB:
         ignore_if_exists: bool = False,
         with_age: bool = False,
         graph_name: str | None = None,
+        statement: str | None = None,
     ):
         try:
             async with self.pool.acquire() as connection:  # type: ignore
@@ -1112,10 +1553,15 @@ class PostgreSQLDB:
                 elif with_age and not graph_name:
                     raise ValueError("Graph name is required when with_age is True")
 
-                if data is None:
-                    await connection.execute(sql)
+                if statement is None and sql not in SQL_TEMPLATE_NAMES:
+                    if data is None:
+                        await connection.execute(sql)
+                    else:
+                        await connection.execute(sql, *data.values())
                 else:
-                    await connection.execute(sql, *data.values())
+                    await self._fetch(
+                        connection, sql, tuple((data or {}).values()), statement
+                    )
         except (
             asyncpg.exceptions.UniqueViolationError,
             asyncpg.exceptions.DuplicateTableError,
@@ -1133,6 +1579,123 @@ class PostgreSQLDB:
             logger.error(f"PostgreSQL database,\nsql:{sql},\ndata:{data},\nerror:{e}")
             raise
 
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[asyncpg.Connection]:
+        """Hold one pooled connection inside a transaction.
+
+        Statements issued on the yielded connection (or through
+        ``execute_many(..., connection=...)``) commit or roll back together.
+        """
+        async with self.pool.acquire() as connection:  # type: ignore
+            async with connection.transaction():
+                yield connection
+
+    async def filter_missing_keys(self, table_name: str, keys: set[str]) -> set[str]:
+        """Return the keys that have no row in ``table_name`` for this workspace.
+
+        Keys are bound as one array per statement, ``filter_keys_chunk_size``
+        keys at a time, so every call reuses the same prepared statement.
+        """
+        if not keys:
+            return set()
+        sql = SQL_TEMPLATES["filter_keys"].format(table_name=table_name)
+        key_list = list(keys)
+        missing = set(keys)
+        for i in range(0, len(key_list), self.filter_keys_chunk_size):
+            chunk = key_list[i : i + self.filter_keys_chunk_size]
+            rows = await self.query(
+                sql,
+                {"workspace": self.workspace, "ids": chunk},
+                multirows=True,
+                statement=f"filter_keys_{table_name}",
+            )
+            missing.difference_update(row["id"] for row in rows)
+        return missing
+
+    async def iter_rows(
+        self,
+        sql: str,
+        params: dict[str, Any] | None = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Stream the rows of ``sql`` through a server-side cursor.
+
+        The cursor lives in a transaction on one pooled connection, held
+        until the iteration finishes or is closed.
+        """
+        async with self.transaction() as connection:
+            cursor = await connection.cursor(sql, *(params or {}).values())
+            while True:
+                rows = await cursor.fetch(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+
+    async def execute_many(
+        self,
+        sql: str,
+        rows: list[dict[str, Any]] | list[tuple],
+        statement: str | None = None,
+        connection: asyncpg.Connection | None = None,
+    ) -> None:
+        """Execute ``sql`` once per row as a single pipelined batch.
+
+        Rows are dicts (bound in value order, like ``execute``) or tuples.
+        Without ``connection`` the batch runs in its own transaction.
+        """
+        if not rows:
+            return
+        args = [tuple(row.values()) if isinstance(row, dict) else row for row in rows]
+        statement = statement or SQL_TEMPLATE_NAMES.get(sql, "execute_many")
+        self.statement_stats[statement] = self.statement_stats.get(statement, 0) + 1
+        try:
+            if connection is None:
+                async with self.transaction() as connection:
+                    await connection.executemany(sql, args)
+            else:
+                await connection.executemany(sql, args)
+        except Exception as e:
+            logger.error(
+                f"PostgreSQL database, batch of {len(args)} rows failed,\nsql:{sql},\nerror:{e}"
+            )
+            raise
+
+    async def copy_upsert(
+        self,
+        table_name: str,
+        columns: list[str],
+        records: list[tuple],
+        merge_sql: str,
+    ) -> None:
+        """Bulk upsert records through a temporary staging table.
+
+        The records are streamed into a session-local copy of ``table_name``
+        with binary COPY, then merged by ``merge_sql`` (which reads from
+        ``{staging_table}``) in the same transaction, so a batch costs a
+        handful of round-trips instead of one per row.
+        """
+        if not records:
+            return
+
+        staging_table = f"{table_name.lower()}_staging"
+        try:
+            async with self.transaction() as connection:
+                await connection.execute(
+                    f"CREATE TEMP TABLE {staging_table} "
+                    f"(LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                await connection.copy_records_to_table(
+                    staging_table, records=records, columns=columns
+                )
+                await connection.execute(merge_sql.format(staging_table=staging_table))
+        except Exception as e:
+            logger.error(
+                f"PostgreSQL database, bulk upsert into {table_name} failed "
+                f"({len(records)} records), error:{e}"
+            )
+            raise
+
 
 class ClientManager:
     _instances: dict[str, Any] = {"db": None, "ref_count": 0}
@@ -1170,6 +1733,66 @@ class ClientManager:
                 "POSTGRES_MAX_CONNECTIONS",
                 config.get("postgres", "max_connections", fallback=20),
             ),
+            "statement_cache_size": os.environ.get(
+                "POSTGRES_STATEMENT_CACHE_SIZE",
+                config.get("postgres", "statement_cache_size", fallback=256),
+            ),
+            # Vector index configuration
+            "embedding_dim": os.environ.get(
+                "AZURE_EMBEDDING_DIMENSION",
+                config.get("postgres", "embedding_dim", fallback=None),
+            ),
+            "vector_index_type": os.environ.get(
+                "POSTGRES_VECTOR_INDEX_TYPE",
+                config.get("postgres", "vector_index_type", fallback="hnsw"),
+            ),
+            "hnsw_m": os.environ.get(
+                "POSTGRES_HNSW_M", config.get("postgres", "hnsw_m", fallback=16)
+            ),
+            "hnsw_ef_construction": os.environ.get(
+                "POSTGRES_HNSW_EF_CONSTRUCTION",
+                config.get("postgres", "hnsw_ef_construction", fallback=64),
+            ),
+            "hnsw_ef_search": os.environ.get(
+                "POSTGRES_HNSW_EF_SEARCH",
+                config.get("postgres", "hnsw_ef_search", fallback=40),
+            ),
+            "ivfflat_lists": os.environ.get(
+                "POSTGRES_IVFFLAT_LISTS",
+                config.get("postgres", "ivfflat_lists", fallback=100),
+            ),
+            "ivfflat_probes": os.environ.get(
+                "POSTGRES_IVFFLAT_PROBES",
+                config.get("postgres", "ivfflat_probes", fallback=1),
+            ),
+            "filter_keys_chunk_size": os.environ.get(
+                "POSTGRES_FILTER_KEYS_CHUNK_SIZE",
+                config.get("postgres", "filter_keys_chunk_size", fallback=10000),
+            ),
+            "graph_read_mode": os.environ.get(
+                "POSTGRES_GRAPH_READ_MODE",
+                config.get("postgres", "graph_read_mode", fallback="cypher"),
+            ),
+            "graph_traversal_mode": os.environ.get(
+                "POSTGRES_GRAPH_TRAVERSAL_MODE",
+                config.get("postgres", "graph_traversal_mode", fallback="client"),
+            ),
+            "graph_read_batch_size": os.environ.get(
+                "POSTGRES_GRAPH_READ_BATCH_SIZE",
+                config.get("postgres", "graph_read_batch_size", fallback=500),
+            ),
+            "graph_upsert_batch_size": os.environ.get(
+                "POSTGRES_GRAPH_UPSERT_BATCH_SIZE",
+                config.get("postgres", "graph_upsert_batch_size", fallback=500),
+            ),
+            "vector_query_mode": os.environ.get(
+                "POSTGRES_VECTOR_QUERY_MODE",
+                config.get("postgres", "vector_query_mode", fallback="ann"),
+            ),
+            "vector_iterative_scan": os.environ.get(
+                "POSTGRES_VECTOR_ITERATIVE_SCAN",
+                config.get("postgres", "vector_iterative_scan", fallback="relaxed_order"),
+            ),
             # SSL configuration
             "ssl_mode": os.environ.get(
                 "POSTGRES_SSL_MODE",
@@ -1250,9 +1873,57 @@ class PGKVStorage(BaseKVStorage):
             self.db = None
 
     ################ QUERY METHODS ################
-    async def get_all(self) -> dict[str, Any]:
+    def _decode_row(self, row: dict[str, Any]) -> dict[str, Any]:
+        """Decode one stored row for this namespace; shared by every read path."""
+        create_time = row.get("create_time", 0)
+        update_time = row.get("update_time", 0)
+
+        # Special handling for LLM cache to ensure compatibility with _get_cached_extraction_results
+        if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
+            # Map field names and add cache_type for compatibility
+            return {
+                **row,
+                "return": row.get("return_value", ""),
+                "cache_type": row.get("cache_type"),
+                "original_prompt": row.get("original_prompt", ""),
+                "chunk_id": row.get("chunk_id"),
+                "mode": row.get("mode", "default"),
+                "create_time": create_time,
+                "update_time": create_time if update_time == 0 else update_time,
+            }
+
+        if is_namespace(self.namespace, NameSpace.KV_STORE_TEXT_CHUNKS):
+            _decode_json_columns(row, {"llm_cache_list": []})
+        elif is_namespace(self.namespace, NameSpace.KV_STORE_FULL_ENTITIES):
+            _decode_json_columns(row, {"entity_names": []})
+        elif is_namespace(self.namespace, NameSpace.KV_STORE_FULL_RELATIONS):
+            _decode_json_columns(row, {"relation_pairs": []})
+        else:
+            # For other namespaces, return as-is
+            return row
+
+        row["create_time"] = create_time
+        row["update_time"] = create_time if update_time == 0 else update_time
+        return row
+
+    def _select_all_sql(self, table_name: str, columns: list[str] | None) -> str:
+        if columns is None:
+            select_list = "*"
+        else:
+            for column in columns:
+                if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", column):
+                    raise ValueError(f"Invalid column name: {column!r}")
+            # id keys the results, so it is always selected
+            select_list = ", ".join(["id"] + [c for c in columns if c != "id"])
+        return f"SELECT {select_list} FROM {table_name} WHERE workspace=$1"
+
+    async def get_all(self, columns: list[str] | None = None) -> dict[str, Any]:
         """Get all data from storage
 
+        Args:
+            columns: Optional projection; only these columns (plus id) are
+                read. None reads every column.
+
         Returns:
             Dictionary containing all stored data
         """
@@ -1261,266 +1932,58 @@ class PGKVStorage(BaseKVStorage):
             logger.error(f"Unknown namespace for get_all: {self.namespace}")
             return {}
 
-        sql = f"SELECT * FROM {table_name} WHERE workspace=$1"
+        sql = self._select_all_sql(table_name, columns)
         params = {"workspace": self.db.workspace}
 
         try:
             results = await self.db.query(sql, params, multirows=True)
-
-            # Special handling for LLM cache to ensure compatibility with _get_cached_extraction_results
-            if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
-                processed_results = {}
-                for row in results:
-                    create_time = row.get("create_time", 0)
-                    update_time = row.get("update_time", 0)
-                    # Map field names and add cache_type for compatibility
-                    processed_row = {
-                        **row,
-                        "return": row.get("return_value", ""),
-                        "cache_type": row.get("original_prompt", "unknow"),
-                        "original_prompt": row.get("original_prompt", ""),
-                        "chunk_id": row.get("chunk_id"),
-                        "mode": row.get("mode", "default"),
-                        "create_time": create_time,
-                        "update_time": create_time if update_time == 0 else update_time,
-                    }
-                    processed_results[row["id"]] = processed_row
-                return processed_results
-
-            # For text_chunks namespace, parse llm_cache_list JSON string back to list
-            if is_namespace(self.namespace, NameSpace.KV_STORE_TEXT_CHUNKS):
-                processed_results = {}
-                for row in results:
-                    llm_cache_list = row.get("llm_cache_list", [])
-                    if isinstance(llm_cache_list, str):
-                        try:
-                            llm_cache_list = json.loads(llm_cache_list)
-                        except json.JSONDecodeError:
-                            llm_cache_list = []
-                    row["llm_cache_list"] = llm_cache_list
-                    create_time = row.get("create_time", 0)
-                    update_time = row.get("update_time", 0)
-                    row["create_time"] = create_time
-                    row["update_time"] = (
-                        create_time if update_time == 0 else update_time
-                    )
-                    processed_results[row["id"]] = row
-                return processed_results
-
-            # For FULL_ENTITIES namespace, parse entity_names JSON string back to list
-            if is_namespace(self.namespace, NameSpace.KV_STORE_FULL_ENTITIES):
-                processed_results = {}
-                for row in results:
-                    entity_names = row.get("entity_names", [])
-                    if isinstance(entity_names, str):
-                        try:
-                            entity_names = json.loads(entity_names)
-                        except json.JSONDecodeError:
-                            entity_names = []
-                    row["entity_names"] = entity_names
-                    create_time = row.get("create_time", 0)
-                    update_time = row.get("update_time", 0)
-                    row["create_time"] = create_time
-                    row["update_time"] = (
-                        create_time if update_time == 0 else update_time
-                    )
-                    processed_results[row["id"]] = row
-                return processed_results
-
-            # For FULL_RELATIONS namespace, parse relation_pairs JSON string back to list
-            if is_namespace(self.namespace, NameSpace.KV_STORE_FULL_RELATIONS):
-                processed_results = {}
-                for row in results:
-                    relation_pairs = row.get("relation_pairs", [])
-                    if isinstance(relation_pairs, str):
-                        try:
-                            relation_pairs = json.loads(relation_pairs)
-                        except json.JSONDecodeError:
-                            relation_pairs = []
-                    row["relation_pairs"] = relation_pairs
-                    create_time = row.get("create_time", 0)
-                    update_time = row.get("update_time", 0)
-                    row["create_time"] = create_time
-                    row["update_time"] = (
-                        create_time if update_time == 0 else update_time
-                    )
-                    processed_results[row["id"]] = row
-                return processed_results
-
-            # For other namespaces, return as-is
-            return {row["id"]: row for row in results}
+            return {row["id"]: self._decode_row(row) for row in results}
         except Exception as e:
             logger.error(f"Error retrieving all data from {self.namespace}: {e}")
             return {}
 
+    async def iter_all(
+        self, batch_size: int = 1000, columns: list[str] | None = None
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Yield every stored row of this namespace, decoded as in get_all.
+
+        Rows are read through a server-side cursor ``batch_size`` at a time,
+        so memory stays bounded by one batch regardless of table size.
+        """
+        table_name = namespace_to_table_name(self.namespace)
+        if not table_name:
+            logger.error(f"Unknown namespace for iter_all: {self.namespace}")
+            return
+
+        sql = self._select_all_sql(table_name, columns)
+        async for row in self.db.iter_rows(
+            sql, {"workspace": self.db.workspace}, batch_size=batch_size
+        ):
+            yield self._decode_row(row)
+
     async def get_by_id(self, id: str) -> dict[str, Any] | None:
         """Get data by id."""
         sql = SQL_TEMPLATES["get_by_id_" + self.namespace]
         params = {"workspace": self.db.workspace, "id": id}
         response = await self.db.query(sql, params)
-
-        if response and is_namespace(self.namespace, NameSpace.KV_STORE_TEXT_CHUNKS):
-            # Parse llm_cache_list JSON string back to list
-            llm_cache_list = response.get("llm_cache_list", [])
-            if isinstance(llm_cache_list, str):
-                try:
-                    llm_cache_list = json.loads(llm_cache_list)
-                except json.JSONDecodeError:
-                    llm_cache_list = []
-            response["llm_cache_list"] = llm_cache_list
-            create_time = response.get("create_time", 0)
-            update_time = response.get("update_time", 0)
-            response["create_time"] = create_time
-            response["update_time"] = create_time if update_time == 0 else update_time
-
-        # Special handling for LLM cache to ensure compatibility with _get_cached_extraction_results
-        if response and is_namespace(
-            self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE
-        ):
-            create_time = response.get("create_time", 0)
-            update_time = response.get("update_time", 0)
-            # Map field names and add cache_type for compatibility
-            response = {
-                **response,
-                "return": response.get("return_value", ""),
-                "cache_type": response.get("cache_type"),
-                "original_prompt": response.get("original_prompt", ""),
-                "chunk_id": response.get("chunk_id"),
-                "mode": response.get("mode", "default"),
-                "create_time": create_time,
-                "update_time": create_time if update_time == 0 else update_time,
-            }
-
-        # Special handling for FULL_ENTITIES namespace
-        if response and is_namespace(self.namespace, NameSpace.KV_STORE_FULL_ENTITIES):
-            # Parse entity_names JSON string back to list
-            entity_names = response.get("entity_names", [])
-            if isinstance(entity_names, str):
-                try:
-                    entity_names = json.loads(entity_names)
-                except json.JSONDecodeError:
-                    entity_names = []
-            response["entity_names"] = entity_names
-            create_time = response.get("create_time", 0)
-            update_time = response.get("update_time", 0)
-            response["create_time"] = create_time
-            response["update_time"] = create_time if update_time == 0 else update_time
-
-        # Special handling for FULL_RELATIONS namespace
-        if response and is_namespace(self.namespace, NameSpace.KV_STORE_FULL_RELATIONS):
-            # Parse relation_pairs JSON string back to list
-            relation_pairs = response.get("relation_pairs", [])
-            if isinstance(relation_pairs, str):
-                try:
-                    relation_pairs = json.loads(relation_pairs)
-                except json.JSONDecodeError:
-                    relation_pairs = []
-            response["relation_pairs"] = relation_pairs
-            create_time = response.get("create_time", 0)
-            update_time = response.get("update_time", 0)
-            response["create_time"] = create_time
-            response["update_time"] = create_time if update_time == 0 else update_time
-
-        return response if response else None
+        return self._decode_row(response) if response else None
 
     # Query by id
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
         """Get data by ids"""
-        sql = SQL_TEMPLATES["get_by_ids_" + self.namespace].format(
-            ids=",".join([f"'{id}'" for id in ids])
-        )
-        params = {"workspace": self.db.workspace}
+        sql = SQL_TEMPLATES["get_by_ids_" + self.namespace]
+        params = {"workspace": self.db.workspace, "ids": list(ids)}
         results = await self.db.query(sql, params, multirows=True)
-
-        if results and is_namespace(self.namespace, NameSpace.KV_STORE_TEXT_CHUNKS):
-            # Parse llm_cache_list JSON string back to list for each result
-            for result in results:
-                llm_cache_list = result.get("llm_cache_list", [])
-                if isinstance(llm_cache_list, str):
-                    try:
-                        llm_cache_list = json.loads(llm_cache_list)
-                    except json.JSONDecodeError:
-                        llm_cache_list = []
-                result["llm_cache_list"] = llm_cache_list
-                create_time = result.get("create_time", 0)
-                update_time = result.get("update_time", 0)
-                result["create_time"] = create_time
-                result["update_time"] = create_time if update_time == 0 else update_time
-
-        # Special handling for LLM cache to ensure compatibility with _get_cached_extraction_results
-        if results and is_namespace(
-            self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE
-        ):
-            processed_results = []
-            for row in results:
-                create_time = row.get("create_time", 0)
-                update_time = row.get("update_time", 0)
-                # Map field names and add cache_type for compatibility
-                processed_row = {
-                    **row,
-                    "return": row.get("return_value", ""),
-                    "cache_type": row.get("cache_type"),
-                    "original_prompt": row.get("original_prompt", ""),
-                    "chunk_id": row.get("chunk_id"),
-                    "mode": row.get("mode", "default"),
-                    "create_time": create_time,
-                    "update_time": create_time if update_time == 0 else update_time,
-                }
-                processed_results.append(processed_row)
-            return processed_results
-
-        # Special handling for FULL_ENTITIES namespace
-        if results and is_namespace(self.namespace, NameSpace.KV_STORE_FULL_ENTITIES):
-            for result in results:
-                # Parse entity_names JSON string back to list
-                entity_names = result.get("entity_names", [])
-                if isinstance(entity_names, str):
-                    try:
-                        entity_names = json.loads(entity_names)
-                    except json.JSONDecodeError:
-                        entity_names = []
-                result["entity_names"] = entity_names
-                create_time = result.get("create_time", 0)
-                update_time = result.get("update_time", 0)
-                result["create_time"] = create_time
-                result["update_time"] = create_time if update_time == 0 else update_time
-
-        # Special handling for FULL_RELATIONS namespace
-        if results and is_namespace(self.namespace, NameSpace.KV_STORE_FULL_RELATIONS):
-            for result in results:
-                # Parse relation_pairs JSON string back to list
-                relation_pairs = result.get("relation_pairs", [])
-                if isinstance(relation_pairs, str):
-                    try:
-                        relation_pairs = json.loads(relation_pairs)
-                    except json.JSONDecodeError:
-                        relation_pairs = []
-                result["relation_pairs"] = relation_pairs
-                create_time = result.get("create_time", 0)
-                update_time = result.get("update_time", 0)
-                result["create_time"] = create_time
-                result["update_time"] = create_time if update_time == 0 else update_time
-
-        return results if results else []
+        return [self._decode_row(row) for row in results] if results else []
 
     async def filter_keys(self, keys: set[str]) -> set[str]:
         """Filter out duplicated content"""
-        sql = SQL_TEMPLATES["filter_keys"].format(
-            table_name=namespace_to_table_name(self.namespace),
-            ids=",".join([f"'{id}'" for id in keys]),
-        )
-        params = {"workspace": self.db.workspace}
+        table_name = namespace_to_table_name(self.namespace)
         try:
-            res = await self.db.query(sql, params, multirows=True)
-            if res:
-                exist_keys = [key["id"] for key in res]
-            else:
-                exist_keys = []
-            new_keys = set([s for s in keys if s not in exist_keys])
-            return new_keys
+            return await self.db.filter_missing_keys(table_name, keys)
         except Exception as e:
             logger.error(
-                f"PostgreSQL database,\nsql:{sql},\nparams:{params},\nerror:{e}"
+                f"PostgreSQL database, filter_keys on {table_name} ({len(keys)} keys), error:{e}"
             )
             raise
 
@@ -1530,77 +1993,63 @@ class PGKVStorage(BaseKVStorage):
         if not data:
             return
 
+        # Each namespace is written by one set-based statement: the rows are
+        # passed as one array per column and expanded with unnest(). JSON
+        # columns travel as text[] (a list inside a jsonb[] parameter would be
+        # taken for a sub-array) and are cast to jsonb per element in SQL
+        current_time = datetime.datetime.now(timezone.utc).replace(tzinfo=None)
         if is_namespace(self.namespace, NameSpace.KV_STORE_TEXT_CHUNKS):
-            # Get current UTC time and convert to naive datetime for database storage
-            current_time = datetime.datetime.now(timezone.utc).replace(tzinfo=None)
-            for k, v in data.items():
-                upsert_sql = SQL_TEMPLATES["upsert_text_chunk"]
-                _data = {
-                    "workspace": self.db.workspace,
-                    "id": k,
-                    "tokens": v["tokens"],
-                    "chunk_order_index": v["chunk_order_index"],
-                    "full_doc_id": v["full_doc_id"],
-                    "content": v["content"],
-                    "file_path": v["file_path"],
-                    "llm_cache_list": json.dumps(v.get("llm_cache_list", [])),
-                    "create_time": current_time,
-                    "update_time": current_time,
-                }
-                await self.db.execute(upsert_sql, _data)
+            upsert_sql = SQL_TEMPLATES["upsert_text_chunk"]
+            columns = {
+                "id": list(data.keys()),
+                "tokens": [v["tokens"] for v in data.values()],
+                "chunk_order_index": [v["chunk_order_index"] for v in data.values()],
+                "full_doc_id": [v["full_doc_id"] for v in data.values()],
+                "content": [v["content"] for v in data.values()],
+                "file_path": [v["file_path"] for v in data.values()],
+                "llm_cache_list": [
+                    _json_dumps(v.get("llm_cache_list", [])) for v in data.values()
+                ],
+                "current_time": current_time,
+            }
         elif is_namespace(self.namespace, NameSpace.KV_STORE_FULL_DOCS):
-            for k, v in data.items():
-                upsert_sql = SQL_TEMPLATES["upsert_doc_full"]
-                _data = {
-                    "id": k,
-                    "content": v["content"],
-                    "workspace": self.db.workspace,
-                }
-                await self.db.execute(upsert_sql, _data)
+            upsert_sql = SQL_TEMPLATES["upsert_doc_full"]
+            columns = {
+                "id": list(data.keys()),
+                "content": [v["content"] for v in data.values()],
+            }
         elif is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
-            for k, v in data.items():
-                upsert_sql = SQL_TEMPLATES["upsert_llm_response_cache"]
-                _data = {
-                    "workspace": self.db.workspace,
-                    "id": k,  # Use flattened key as id
-                    "original_prompt": v["original_prompt"],
-                    "return_value": v["return"],
-                    "mode": v.get("mode", "default"),  # Get mode from data
-                    "chunk_id": v.get("chunk_id"),
-                    "cache_type": v.get(
-                        "cache_type", "extract"
-                    ),  # Get cache_type from data
-                }
-
-                await self.db.execute(upsert_sql, _data)
+            upsert_sql = SQL_TEMPLATES["upsert_llm_response_cache"]
+            columns = {
+                "id": list(data.keys()),  # Use flattened key as id
+                "original_prompt": [v["original_prompt"] for v in data.values()],
+                "return_value": [v["return"] for v in data.values()],
+                "mode": [v.get("mode", "default") for v in data.values()],
+                "chunk_id": [v.get("chunk_id") for v in data.values()],
+                "cache_type": [v.get("cache_type", "extract") for v in data.values()],
+            }
         elif is_namespace(self.namespace, NameSpace.KV_STORE_FULL_ENTITIES):
-            # Get current UTC time and convert to naive datetime for database storage
-            current_time = datetime.datetime.now(timezone.utc).replace(tzinfo=None)
-            for k, v in data.items():
-                upsert_sql = SQL_TEMPLATES["upsert_full_entities"]
-                _data = {
-                    "workspace": self.db.workspace,
-                    "id": k,
-                    "entity_names": json.dumps(v["entity_names"]),
-                    "count": v["count"],
-                    "create_time": current_time,
-                    "update_time": current_time,
-                }
-                await self.db.execute(upsert_sql, _data)
+            upsert_sql = SQL_TEMPLATES["upsert_full_entities"]
+            columns = {
+                "id": list(data.keys()),
+                "entity_names": [_json_dumps(v["entity_names"]) for v in data.values()],
+                "count": [v["count"] for v in data.values()],
+                "current_time": current_time,
+            }
         elif is_namespace(self.namespace, NameSpace.KV_STORE_FULL_RELATIONS):
-            # Get current UTC time and convert to naive datetime for database storage
-            current_time = datetime.datetime.now(timezone.utc).replace(tzinfo=None)
-            for k, v in data.items():
-                upsert_sql = SQL_TEMPLATES["upsert_full_relations"]
-                _data = {
-                    "workspace": self.db.workspace,
-                    "id": k,
-                    "relation_pairs": json.dumps(v["relation_pairs"]),
-                    "count": v["count"],
-                    "create_time": current_time,
-                    "update_time": current_time,
-                }
-                await self.db.execute(upsert_sql, _data)
+            upsert_sql = SQL_TEMPLATES["upsert_full_relations"]
+            columns = {
+                "id": list(data.keys()),
+                "relation_pairs": [
+                    _json_dumps(v["relation_pairs"]) for v in data.values()
+                ],
+                "count": [v["count"] for v in data.values()],
+                "current_time": current_time,
+            }
+        else:
+            return
+
+        await self.db.execute(upsert_sql, {"workspace": self.db.workspace, **columns})
 
     async def index_done_callback(self) -> None:
         # PG handles persistence automatically
@@ -1701,6 +2150,14 @@ class PGVectorStorage(BaseVectorStorage):
                 "cosine_better_than_threshold must be specified in vector_db_storage_cls_kwargs"
             )
         self.cosine_better_than_threshold = cosine_threshold
+        self.ef_search = config.get("ef_search")
+        # Retrieve candidates on quantized vectors, re-rank at full precision
+        self.vector_quantization = (config.get("vector_quantization") or "none").lower()
+        if self.vector_quantization not in ("none", "halfvec", "binary"):
+            raise ValueError(
+                f"vector_quantization must be one of none, halfvec, binary, got {self.vector_quantization}"
+            )
+        self.rerank_factor = int(config.get("rerank_factor", 4))
 
     async def initialize(self):
         if self.db is None:
@@ -1718,6 +2175,17 @@ class PGVectorStorage(BaseVectorStorage):
                 final_workspace = "default"
                 self.db.workspace = final_workspace
 
+        if self.vector_quantization != "none":
+            if not self.db.embedding_dim:
+                logger.warning(
+                    f"{self.namespace}: vector_quantization requires AZURE_EMBEDDING_DIMENSION, disabled"
+                )
+                self.vector_quantization = "none"
+            else:
+                await self.db.create_quantized_vector_index(
+                    namespace_to_table_name(self.namespace), self.vector_quantization
+                )
+
     async def finalize(self):
         if self.db is not None:
             await ClientManager.release_client(self.db)
@@ -1725,9 +2193,8 @@ class PGVectorStorage(BaseVectorStorage):
 
     def _upsert_chunks(
         self, item: dict[str, Any], current_time: datetime.datetime
-    ) -> tuple[str, dict[str, Any]]:
+    ) -> dict[str, Any]:
         try:
-            upsert_sql = SQL_TEMPLATES["upsert_chunk"]
             data: dict[str, Any] = {
                 "workspace": self.db.workspace,
                 "id": item["__id__"],
@@ -1735,7 +2202,7 @@ class PGVectorStorage(BaseVectorStorage):
                 "chunk_order_index": item["chunk_order_index"],
                 "full_doc_id": item["full_doc_id"],
                 "content": item["content"],
-                "content_vector": json.dumps(item["__vector__"].tolist()),
+                "content_vector": item["__vector__"],
                 "file_path": item["file_path"],
                 "create_time": current_time,
                 "update_time": current_time,
@@ -1744,12 +2211,11 @@ class PGVectorStorage(BaseVectorStorage):
             logger.error(f"Error to prepare upsert,\nsql: {e}\nitem: {item}")
             raise
 
-        return upsert_sql, data
+        return data
 
     def _upsert_entities(
         self, item: dict[str, Any], current_time: datetime.datetime
-    ) -> tuple[str, dict[str, Any]]:
-        upsert_sql = SQL_TEMPLATES["upsert_entity"]
+    ) -> dict[str, Any]:
         source_id = item["source_id"]
         if isinstance(source_id, str) and "<SEP>" in source_id:
             chunk_ids = source_id.split("<SEP>")
@@ -1761,18 +2227,17 @@ class PGVectorStorage(BaseVectorStorage):
             "id": item["__id__"],
             "entity_name": item["entity_name"],
             "content": item["content"],
-            "content_vector": json.dumps(item["__vector__"].tolist()),
+            "content_vector": item["__vector__"],
             "chunk_ids": chunk_ids,
             "file_path": item.get("file_path", None),
             "create_time": current_time,
             "update_time": current_time,
         }
-        return upsert_sql, data
+        return data
 
     def _upsert_relationships(
         self, item: dict[str, Any], current_time: datetime.datetime
-    ) -> tuple[str, dict[str, Any]]:
-        upsert_sql = SQL_TEMPLATES["upsert_relationship"]
+    ) -> dict[str, Any]:
         source_id = item["source_id"]
         if isinstance(source_id, str) and "<SEP>" in source_id:
             chunk_ids = source_id.split("<SEP>")
@@ -1785,13 +2250,13 @@ class PGVectorStorage(BaseVectorStorage):
             "source_id": item["src_id"],
             "target_id": item["tgt_id"],
             "content": item["content"],
-            "content_vector": json.dumps(item["__vector__"].tolist()),
+            "content_vector": item["__vector__"],
             "chunk_ids": chunk_ids,
             "file_path": item.get("file_path", None),
             "create_time": current_time,
             "update_time": current_time,
         }
-        return upsert_sql, data
+        return data
 
     async def upsert(self, data: dict[str, dict[str, Any]]) -> None:
         logger.debug(f"Inserting {len(data)} to {self.namespace}")
@@ -1819,36 +2284,207 @@ class PGVectorStorage(BaseVectorStorage):
         embeddings = np.concatenate(embeddings_list)
         for i, d in enumerate(list_data):
             d["__vector__"] = embeddings[i]
-        for item in list_data:
-            if is_namespace(self.namespace, NameSpace.VECTOR_STORE_CHUNKS):
-                upsert_sql, data = self._upsert_chunks(item, current_time)
-            elif is_namespace(self.namespace, NameSpace.VECTOR_STORE_ENTITIES):
-                upsert_sql, data = self._upsert_entities(item, current_time)
-            elif is_namespace(self.namespace, NameSpace.VECTOR_STORE_RELATIONSHIPS):
-                upsert_sql, data = self._upsert_relationships(item, current_time)
-            else:
-                raise ValueError(f"{self.namespace} is not supported")
 
-            await self.db.execute(upsert_sql, data)
+        if is_namespace(self.namespace, NameSpace.VECTOR_STORE_CHUNKS):
+            prepare_row, merge_sql = self._upsert_chunks, SQL_TEMPLATES["merge_chunk"]
+        elif is_namespace(self.namespace, NameSpace.VECTOR_STORE_ENTITIES):
+            prepare_row, merge_sql = self._upsert_entities, SQL_TEMPLATES["merge_entity"]
+        elif is_namespace(self.namespace, NameSpace.VECTOR_STORE_RELATIONSHIPS):
+            prepare_row, merge_sql = (
+                self._upsert_relationships,
+                SQL_TEMPLATES["merge_relationship"],
+            )
+        else:
+            raise ValueError(f"{self.namespace} is not supported")
+
+        rows = [prepare_row(item, current_time) for item in list_data]
+        await self.db.copy_upsert(
+            namespace_to_table_name(self.namespace),
+            list(rows[0].keys()),
+            [tuple(row.values()) for row in rows],
+            merge_sql,
+        )
 
     #################### query method ###############
+    def _resolve_query_mode(self, query_mode: str | None) -> str:
+        if query_mode is not None:
+            return query_mode
+        if self.vector_quantization != "none":
+            return "quantized"
+        return self.db.vector_query_mode
+
+    def _build_query(
+        self,
+        query_mode: str,
+        embedding: Any,
+        top_k: int,
+        ids: list[str] | None,
+        ef_search: int | None,
+        query_vector: str = "$2",
+    ) -> tuple[str, str, dict[str, Any], dict[str, str]]:
+        """Build the statement name, SQL, bound parameters and session settings
+        of a search.
+
+        ``embedding`` is always bound as $2; ``query_vector`` is the SQL
+        expression the distance is computed against, which differs from $2
+        when several query vectors are searched at once.
+        """
+        if query_mode == "legacy":
+            # Use parameterized document IDs (None means search across all documents)
+            sql = SQL_TEMPLATES[self.namespace]
+            params = {
+                "workspace": self.db.workspace,
+                "doc_ids": ids,
+                "better_than_threshold": self.cosine_better_than_threshold,
+                "top_k": top_k,
+                "embedding": embedding,
+            }
+            return (
+                self.namespace,
+                sql,
+                params,
+                self.db.vector_search_settings(top_k, ef_search),
+            )
+
+        if query_mode == "quantized" and self.vector_quantization != "none":
+            # Over-fetch candidates through the quantized index, then keep the
+            # top_k by full-precision distance
+            candidates = top_k * self.rerank_factor
+            doc_filter = ""
+            if ids is not None and is_namespace(
+                self.namespace, NameSpace.VECTOR_STORE_CHUNKS
+            ):
+                doc_filter = SQL_TEMPLATES["chunks_doc_filter"]
+            elif ids is not None:
+                doc_filter = SQL_TEMPLATES["chunk_ids_doc_filter"]
+            template = f"{self.namespace}_quantized"
+            sql = SQL_TEMPLATES[template].format(
+                distance=self.db.quantized_distance_sql(
+                    self.vector_quantization, query_vector
+                ),
+                doc_filter=doc_filter,
+                query_vector=query_vector,
+            )
+            params = {
+                "workspace": self.db.workspace,
+                "embedding": embedding,
+                "better_than_threshold": self.cosine_better_than_threshold,
+                "candidates": candidates,
+                "top_k": top_k,
+            }
+            settings = self.db.vector_search_settings(
+                candidates, ef_search, filtered=ids is not None
+            )
+        else:
+            # The ANN templates order by the raw distance expression so the
+            # index can drive the scan; the threshold is applied to the top_k
+            # candidates afterwards, which yields the same rows. "exact" runs
+            # the same SQL with index scans disabled, as a recall baseline.
+            template = f"{self.namespace}_ann" if ids is None else f"{self.namespace}_ann_filtered"
+            if query_mode == "exact":
+                distance = f"content_vector <=> {query_vector}::vector"
+                settings = {"enable_indexscan": "off"}
+            else:
+                distance = self.db.vector_distance_sql(query_vector)
+                settings = self.db.vector_search_settings(
+                    top_k, ef_search, filtered=ids is not None
+                )
+            sql = SQL_TEMPLATES[template].format(distance=distance)
+            params = {
+                "workspace": self.db.workspace,
+                "embedding": embedding,
+                "better_than_threshold": self.cosine_better_than_threshold,
+                "top_k": top_k,
+            }
+
+        if ids is not None:
+            params["doc_ids"] = ids
+            template = f"{template}_filtered" if query_mode == "quantized" else template
+        return f"{template}:{query_mode}", sql, params, settings
+
     async def query(
-        self, query: str, top_k: int, ids: list[str] | None = None
+        self,
+        query: str,
+        top_k: int,
+        ids: list[str] | None = None,
+        ef_search: int | None = None,
+        query_mode: str | None = None,
     ) -> list[dict[str, Any]]:
         embeddings = await self.embedding_func(
             [query], _priority=5
         )  # higher priority for query
-        embedding = embeddings[0]
-        embedding_string = ",".join(map(str, embedding))
-        # Use parameterized document IDs (None means search across all documents)
-        sql = SQL_TEMPLATES[self.namespace].format(embedding_string=embedding_string)
-        params = {
-            "workspace": self.db.workspace,
-            "doc_ids": ids,
-            "better_than_threshold": self.cosine_better_than_threshold,
-            "top_k": top_k,
-        }
-        results = await self.db.query(sql, params=params, multirows=True)
+        statement, sql, params, settings = self._build_query(
+            self._resolve_query_mode(query_mode),
+            embeddings[0],
+            top_k,
+            ids,
+            ef_search or self.ef_search,
+        )
+        results = await self.db.query(
+            sql, params=params, multirows=True, settings=settings, statement=statement
+        )
+        return results
+
+    async def query_many(
+        self,
+        queries: list[str],
+        top_k: int,
+        ids: list[str] | None = None,
+        ef_search: int | None = None,
+        query_mode: str | None = None,
+    ) -> list[list[dict[str, Any]]]:
+        """Search several query strings with one embedding call and one statement.
+
+        Returns one result list per query, in input order.
+        """
+        if not queries:
+            return []
+
+        embeddings = await self.embedding_func(list(queries), _priority=5)
+        query_mode = self._resolve_query_mode(query_mode)
+        ef_search = ef_search or self.ef_search
+
+        if query_mode == "legacy":
+            # Legacy templates bind the vector as $5; run them one by one
+            results = []
+            for embedding in embeddings:
+                statement, sql, params, settings = self._build_query(
+                    query_mode, embedding, top_k, ids, ef_search
+                )
+                results.append(
+                    await self.db.query(
+                        sql,
+                        params=params,
+                        multirows=True,
+                        settings=settings,
+                        statement=statement,
+                    )
+                )
+            return results
+
+        # Tuples, so asyncpg binds each embedding as one vector[] element
+        # rather than as a nested array of scalars
+        statement, sql, params, settings = self._build_query(
+            query_mode,
+            [tuple(embedding) for embedding in embeddings],
+            top_k,
+            ids,
+            ef_search,
+            "q.query_vector",
+        )
+        rows = await self.db.query(
+            SQL_TEMPLATES["query_many"].format(query=sql),
+            params=params,
+            multirows=True,
+            settings=settings,
+            statement=f"query_many:{statement}",
+        )
+
+        results: list[list[dict[str, Any]]] = [[] for _ in queries]
+        for row in rows:
+            query_index = row.pop("query_index")
+            row.pop("query_rank")
+            results[query_index - 1].append(row)
         return results
 
     async def index_done_callback(self) -> None:
@@ -1917,6 +2553,15 @@ class PGVectorStorage(BaseVectorStorage):
         except Exception as e:
             logger.error(f"Error deleting relations for entity {entity_name}: {e}")
 
+    @staticmethod
+    def _vector_record(record: dict[str, Any]) -> dict[str, Any]:
+        """Row as a plain dict; the binary vector codec decodes content_vector
+        to a numpy array, which is returned as a list so it serializes."""
+        data = dict(record)
+        if isinstance(data.get("content_vector"), np.ndarray):
+            data["content_vector"] = data["content_vector"].tolist()
+        return data
+
     async def get_by_id(self, id: str) -> dict[str, Any] | None:
         """Get vector data by its ID
 
@@ -1935,9 +2580,11 @@ class PGVectorStorage(BaseVectorStorage):
         params = {"workspace": self.db.workspace, "id": id}
 
         try:
-            result = await self.db.query(query, params)
+            result = await self.db.query(
+                query, params, statement=f"get_by_id_{table_name}"
+            )
             if result:
-                return dict(result)
+                return self._vector_record(result)
             return None
         except Exception as e:
             logger.error(f"Error retrieving vector data for ID {id}: {e}")
@@ -1960,13 +2607,14 @@ class PGVectorStorage(BaseVectorStorage):
             logger.error(f"Unknown namespace for IDs lookup: {self.namespace}")
             return []
 
-        ids_str = ",".join([f"'{id}'" for id in ids])
-        query = f"SELECT *, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at FROM {table_name} WHERE workspace=$1 AND id IN ({ids_str})"
-        params = {"workspace": self.db.workspace}
+        query = f"SELECT *, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at FROM {table_name} WHERE workspace=$1 AND id = ANY($2::varchar[])"
+        params = {"workspace": self.db.workspace, "ids": list(ids)}
 
         try:
-            results = await self.db.query(query, params, multirows=True)
-            return [dict(record) for record in results]
+            results = await self.db.query(
+                query, params, multirows=True, statement=f"get_by_ids_{table_name}"
+            )
+            return [self._vector_record(record) for record in results]
         except Exception as e:
             logger.error(f"Error retrieving vector data for IDs {ids}: {e}")
             return []
@@ -2028,67 +2676,40 @@ class PGDocStatusStorage(DocStatusStorage):
 
     async def filter_keys(self, keys: set[str]) -> set[str]:
         """Filter out duplicated content"""
-        sql = SQL_TEMPLATES["filter_keys"].format(
-            table_name=namespace_to_table_name(self.namespace),
-            ids=",".join([f"'{id}'" for id in keys]),
-        )
-        params = {"workspace": self.db.workspace}
+        table_name = namespace_to_table_name(self.namespace)
         try:
-            res = await self.db.query(sql, params, multirows=True)
-            if res:
-                exist_keys = [key["id"] for key in res]
-            else:
-                exist_keys = []
-            new_keys = set([s for s in keys if s not in exist_keys])
-            # print(f"keys: {keys}")
-            # print(f"new_keys: {new_keys}")
-            return new_keys
+            return await self.db.filter_missing_keys(table_name, keys)
         except Exception as e:
             logger.error(
-                f"PostgreSQL database,\nsql:{sql},\nparams:{params},\nerror:{e}"
+                f"PostgreSQL database, filter_keys on {table_name} ({len(keys)} keys), error:{e}"
             )
             raise
 
+    def _decode_status_row(self, row: dict[str, Any]) -> dict[str, Any]:
+        """Decode a LIGHTRAG_DOC_STATUS row into DocProcessingStatus fields."""
+        _decode_json_columns(row, {"chunks_list": [], "metadata": {}})
+        return {
+            "content_summary": row["content_summary"],
+            "content_length": row["content_length"],
+            "status": row["status"],
+            "chunks_count": row["chunks_count"],
+            # Convert datetime objects to ISO format strings with timezone info
+            "created_at": self._format_datetime_with_timezone(row["created_at"]),
+            "updated_at": self._format_datetime_with_timezone(row["updated_at"]),
+            "file_path": row["file_path"],
+            "chunks_list": row.get("chunks_list", []),
+            "metadata": row.get("metadata", {}),
+            "error_msg": row.get("error_msg"),
+            "track_id": row.get("track_id"),
+        }
+
     async def get_by_id(self, id: str) -> Union[dict[str, Any], None]:
         sql = "select * from LIGHTRAG_DOC_STATUS where workspace=$1 and id=$2"
         params = {"workspace": self.db.workspace, "id": id}
         result = await self.db.query(sql, params, True)
         if result is None or result == []:
             return None
-        else:
-            # Parse chunks_list JSON string back to list
-            chunks_list = result[0].get("chunks_list", [])
-            if isinstance(chunks_list, str):
-                try:
-                    chunks_list = json.loads(chunks_list)
-                except json.JSONDecodeError:
-                    chunks_list = []
-
-            # Parse metadata JSON string back to dict
-            metadata = result[0].get("metadata", {})
-            if isinstance(metadata, str):
-                try:
-                    metadata = json.loads(metadata)
-                except json.JSONDecodeError:
-                    metadata = {}
-
-            # Convert datetime objects to ISO format strings with timezone info
-            created_at = self._format_datetime_with_timezone(result[0]["created_at"])
-            updated_at = self._format_datetime_with_timezone(result[0]["updated_at"])
-
-            return dict(
-                content_length=result[0]["content_length"],
-                content_summary=result[0]["content_summary"],
-                status=result[0]["status"],
-                chunks_count=result[0]["chunks_count"],
-                created_at=created_at,
-                updated_at=updated_at,
-                file_path=result[0]["file_path"],
-                chunks_list=chunks_list,
-                metadata=metadata,
-                error_msg=result[0].get("error_msg"),
-                track_id=result[0].get("track_id"),
-            )
+        return self._decode_status_row(result[0])
 
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
         """Get doc_chunks data by multiple IDs."""
@@ -2103,45 +2724,7 @@ class PGDocStatusStorage(DocStatusStorage):
         if not results:
             return []
 
-        processed_results = []
-        for row in results:
-            # Parse chunks_list JSON string back to list
-            chunks_list = row.get("chunks_list", [])
-            if isinstance(chunks_list, str):
-                try:
-                    chunks_list = json.loads(chunks_list)
-                except json.JSONDecodeError:
-                    chunks_list = []
-
-            # Parse metadata JSON string back to dict
-            metadata = row.get("metadata", {})
-            if isinstance(metadata, str):
-                try:
-                    metadata = json.loads(metadata)
-                except json.JSONDecodeError:
-                    metadata = {}
-
-            # Convert datetime objects to ISO format strings with timezone info
-            created_at = self._format_datetime_with_timezone(row["created_at"])
-            updated_at = self._format_datetime_with_timezone(row["updated_at"])
-
-            processed_results.append(
-                {
-                    "content_length": row["content_length"],
-                    "content_summary": row["content_summary"],
-                    "status": row["status"],
-                    "chunks_count": row["chunks_count"],
-                    "created_at": created_at,
-                    "updated_at": updated_at,
-                    "file_path": row["file_path"],
-                    "chunks_list": chunks_list,
-                    "metadata": metadata,
-                    "error_msg": row.get("error_msg"),
-                    "track_id": row.get("track_id"),
-                }
-            )
-
-        return processed_results
+        return [self._decode_status_row(row) for row in results]
 
     async def get_status_counts(self) -> dict[str, int]:
         """Get counts of documents in each status"""
@@ -2165,47 +2748,11 @@ class PGDocStatusStorage(DocStatusStorage):
 
         docs_by_status = {}
         for element in result:
-            # Parse chunks_list JSON string back to list
-            chunks_list = element.get("chunks_list", [])
-            if isinstance(chunks_list, str):
-                try:
-                    chunks_list = json.loads(chunks_list)
-                except json.JSONDecodeError:
-                    chunks_list = []
-
-            # Parse metadata JSON string back to dict
-            metadata = element.get("metadata", {})
-            if isinstance(metadata, str):
-                try:
-                    metadata = json.loads(metadata)
-                except json.JSONDecodeError:
-                    metadata = {}
-            # Ensure metadata is a dict
-            if not isinstance(metadata, dict):
-                metadata = {}
-
+            fields = self._decode_status_row(element)
             # Safe handling for file_path
-            file_path = element.get("file_path")
-            if file_path is None:
-                file_path = "no-file-path"
-
-            # Convert datetime objects to ISO format strings with timezone info
-            created_at = self._format_datetime_with_timezone(element["created_at"])
-            updated_at = self._format_datetime_with_timezone(element["updated_at"])
-
-            docs_by_status[element["id"]] = DocProcessingStatus(
-                content_summary=element["content_summary"],
-                content_length=element["content_length"],
-                status=element["status"],
-                created_at=created_at,
-                updated_at=updated_at,
-                chunks_count=element["chunks_count"],
-                file_path=file_path,
-                chunks_list=chunks_list,
-                metadata=metadata,
-                error_msg=element.get("error_msg"),
-                track_id=element.get("track_id"),
-            )
+            if fields["file_path"] is None:
+                fields["file_path"] = "no-file-path"
+            docs_by_status[element["id"]] = DocProcessingStatus(**fields)
 
         return docs_by_status
 
@@ -2219,47 +2766,11 @@ class PGDocStatusStorage(DocStatusStorage):
 
         docs_by_track_id = {}
         for element in result:
-            # Parse chunks_list JSON string back to list
-            chunks_list = element.get("chunks_list", [])
-            if isinstance(chunks_list, str):
-                try:
-                    chunks_list = json.loads(chunks_list)
-                except json.JSONDecodeError:
-                    chunks_list = []
-
-            # Parse metadata JSON string back to dict
-            metadata = element.get("metadata", {})
-            if isinstance(metadata, str):
-                try:
-                    metadata = json.loads(metadata)
-                except json.JSONDecodeError:
-                    metadata = {}
-            # Ensure metadata is a dict
-            if not isinstance(metadata, dict):
-                metadata = {}
-
+            fields = self._decode_status_row(element)
             # Safe handling for file_path
-            file_path = element.get("file_path")
-            if file_path is None:
-                file_path = "no-file-path"
-
-            # Convert datetime objects to ISO format strings with timezone info
-            created_at = self._format_datetime_with_timezone(element["created_at"])
-            updated_at = self._format_datetime_with_timezone(element["updated_at"])
-
-            docs_by_track_id[element["id"]] = DocProcessingStatus(
-                content_summary=element["content_summary"],
-                content_length=element["content_length"],
-                status=element["status"],
-                created_at=created_at,
-                updated_at=updated_at,
-                chunks_count=element["chunks_count"],
-                file_path=file_path,
-                chunks_list=chunks_list,
-                track_id=element.get("track_id"),
-                metadata=metadata,
-                error_msg=element.get("error_msg"),
-            )
+            if fields["file_path"] is None:
+                fields["file_path"] = "no-file-path"
+            docs_by_track_id[element["id"]] = DocProcessingStatus(**fields)
 
         return docs_by_track_id
 
@@ -2333,42 +2844,8 @@ class PGDocStatusStorage(DocStatusStorage):
         # Convert to (doc_id, DocProcessingStatus) tuples
         documents = []
         for element in result:
-            doc_id = element["id"]
-
-            # Parse chunks_list JSON string back to list
-            chunks_list = element.get("chunks_list", [])
-            if isinstance(chunks_list, str):
-                try:
-                    chunks_list = json.loads(chunks_list)
-                except json.JSONDecodeError:
-                    chunks_list = []
-
-            # Parse metadata JSON string back to dict
-            metadata = element.get("metadata", {})
-            if isinstance(metadata, str):
-                try:
-                    metadata = json.loads(metadata)
-                except json.JSONDecodeError:
-                    metadata = {}
-
-            # Convert datetime objects to ISO format strings with timezone info
-            created_at = self._format_datetime_with_timezone(element["created_at"])
-            updated_at = self._format_datetime_with_timezone(element["updated_at"])
-
-            doc_status = DocProcessingStatus(
-                content_summary=element["content_summary"],
-                content_length=element["content_length"],
-                status=element["status"],
-                created_at=created_at,
-                updated_at=updated_at,
-                chunks_count=element["chunks_count"],
-                file_path=element["file_path"],
-                chunks_list=chunks_list,
-                track_id=element.get("track_id"),
-                metadata=metadata,
-                error_msg=element.get("error_msg"),
-            )
-            documents.append((doc_id, doc_status))
+            doc_status = DocProcessingStatus(**self._decode_status_row(element))
+            documents.append((element["id"], doc_status))
 
         return documents, total_count
 
@@ -2460,54 +2937,33 @@ class PGDocStatusStorage(DocStatusStorage):
                 # If no timezone info, assume it's UTC
                 if dt.tzinfo is None:
                     dt = dt.replace(tzinfo=timezone.utc)
-                # Convert to UTC and remove timezone info for storage
-                return dt.astimezone(timezone.utc).replace(tzinfo=None)
-            except (ValueError, TypeError):
-                logger.warning(f"Unable to parse datetime string: {dt_str}")
-                return None
-
-        # Modified SQL to include created_at, updated_at, chunks_list, track_id, metadata, and error_msg in both INSERT and UPDATE operations
-        # All fields are updated from the input data in both INSERT and UPDATE cases
-        sql = """insert into LIGHTRAG_DOC_STATUS(workspace,id,content_summary,content_length,chunks_count,status,file_path,chunks_list,track_id,metadata,error_msg,created_at,updated_at)
-                 values($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12,$13)
-                  on conflict(id,workspace) do update set
-                  content_summary = EXCLUDED.content_summary,
-                  content_length = EXCLUDED.content_length,
-                  chunks_count = EXCLUDED.chunks_count,
-                  status = EXCLUDED.status,
-                  file_path = EXCLUDED.file_path,
-                  chunks_list = EXCLUDED.chunks_list,
-                  track_id = EXCLUDED.track_id,
-                  metadata = EXCLUDED.metadata,
-                  error_msg = EXCLUDED.error_msg,
-                  created_at = EXCLUDED.created_at,
-                  updated_at = EXCLUDED.updated_at"""
-        for k, v in data.items():
-            # Remove timezone information, store utc time in db
-            created_at = parse_datetime(v.get("created_at"))
-            updated_at = parse_datetime(v.get("updated_at"))
+                # Convert to UTC and remove timezone info for storage
+                return dt.astimezone(timezone.utc).replace(tzinfo=None)
+            except (ValueError, TypeError):
+                logger.warning(f"Unable to parse datetime string: {dt_str}")
+                return None
 
-            # chunks_count, chunks_list, track_id, metadata, and error_msg are optional
-            await self.db.execute(
-                sql,
-                {
-                    "workspace": self.db.workspace,
-                    "id": k,
-                    "content_summary": v["content_summary"],
-                    "content_length": v["content_length"],
-                    "chunks_count": v["chunks_count"] if "chunks_count" in v else -1,
-                    "status": v["status"],
-                    "file_path": v["file_path"],
-                    "chunks_list": json.dumps(v.get("chunks_list", [])),
-                    "track_id": v.get("track_id"),  # Add track_id support
-                    "metadata": json.dumps(
-                        v.get("metadata", {})
-                    ),  # Add metadata support
-                    "error_msg": v.get("error_msg"),  # Add error_msg support
-                    "created_at": created_at,  # Use the converted datetime object
-                    "updated_at": updated_at,  # Use the converted datetime object
-                },
-            )
+        # chunks_count, chunks_list, track_id, metadata, and error_msg are optional;
+        # created_at/updated_at are stored as naive UTC
+        rows = [
+            {
+                "workspace": self.db.workspace,
+                "id": k,
+                "content_summary": v["content_summary"],
+                "content_length": v["content_length"],
+                "chunks_count": v["chunks_count"] if "chunks_count" in v else -1,
+                "status": v["status"],
+                "file_path": v["file_path"],
+                "chunks_list": v.get("chunks_list", []),
+                "track_id": v.get("track_id"),
+                "metadata": v.get("metadata", {}),
+                "error_msg": v.get("error_msg"),
+                "created_at": parse_datetime(v.get("created_at")),
+                "updated_at": parse_datetime(v.get("updated_at")),
+            }
+            for k, v in data.items()
+        ]
+        await self.db.execute_many(SQL_TEMPLATES["upsert_doc_status"], rows)
 
     async def drop(self) -> dict[str, str]:
         """Drop the storage"""
@@ -2578,23 +3034,6 @@ class PGGraphStorage(BaseGraphStorage):
             # When workspace is empty or "default", use namespace directly
             return re.sub(r"[^a-zA-Z0-9_]", "_", namespace)
 
-    @staticmethod
-    def _normalize_node_id(node_id: str) -> str:
-        """
-        Normalize node ID to ensure special characters are properly handled in Cypher queries.
-
-        Args:
-            node_id: The original node ID
-
-        Returns:
-            Normalized node ID suitable for Cypher queries
-        """
-        # Escape backslashes
-        normalized_id = node_id
-        normalized_id = normalized_id.replace("\\", "\\\\")
-        normalized_id = normalized_id.replace('"', '\\"')
-        return normalized_id
-
     async def initialize(self):
         if self.db is None:
             self.db = await ClientManager.get_client()
@@ -2625,6 +3064,10 @@ class PGGraphStorage(BaseGraphStorage):
             # First ensure AGE extension is created
             await PostgreSQLDB.configure_age_extension(connection)
 
+        # Connections opened before the extension existed lack AGE's session
+        # setup and agtype codec; recycle them so every connection has both.
+        await self.db.pool.expire_connections()
+
         # Execute each statement separately and ignore errors
         queries = [
             f"SELECT create_graph('{self.graph_name}')",
@@ -2779,37 +3222,13 @@ class PGGraphStorage(BaseGraphStorage):
 
         return d
 
-    @staticmethod
-    def _format_properties(
-        properties: dict[str, Any], _id: Union[str, None] = None
-    ) -> str:
-        """
-        Convert a dictionary of properties to a string representation that
-        can be used in a cypher query insert/merge statement.
-
-        Args:
-            properties (dict[str,str]): a dictionary containing node/edge properties
-            _id (Union[str, None]): the id of the node or None if none exists
-
-        Returns:
-            str: the properties dictionary as a properly formatted string
-        """
-        props = []
-        # wrap property key in backticks to escape
-        for k, v in properties.items():
-            prop = f"`{k}`: {json.dumps(v)}"
-            props.append(prop)
-        if _id is not None and "id" not in properties:
-            props.append(
-                f"id: {json.dumps(_id)}" if isinstance(_id, str) else f"id: {_id}"
-            )
-        return "{" + ", ".join(props) + "}"
-
     async def _query(
         self,
         query: str,
         readonly: bool = True,
         upsert: bool = False,
+        params: dict[str, Any] | None = None,
+        statement: str | None = None,
     ) -> list[dict[str, Any]]:
         """
         Query the graph by taking a cypher query, converting it to an
@@ -2817,24 +3236,34 @@ class PGGraphStorage(BaseGraphStorage):
 
         Args:
             query (str): a cypher query to be executed
+            params (dict): cypher parameters, bound as the agtype map $1
+                that the query passes as cypher()'s third argument
+            statement (str): name under which the query is counted in statement_stats
 
         Returns:
             list[dict[str, Any]]: a list of dictionaries containing the result set
         """
+        sql_params = {"params": _json_dumps(params)} if params is not None else None
+        if statement is not None:
+            statement = f"graph_{statement}"
         try:
             if readonly:
                 data = await self.db.query(
                     query,
+                    sql_params,
                     multirows=True,
                     with_age=True,
                     graph_name=self.graph_name,
+                    statement=statement,
                 )
             else:
                 data = await self.db.execute(
                     query,
+                    sql_params,
                     upsert=upsert,
                     with_age=True,
                     graph_name=self.graph_name,
+                    statement=statement,
                 )
 
         except Exception as e:
@@ -2854,44 +3283,74 @@ class PGGraphStorage(BaseGraphStorage):
 
         return result
 
+    async def _sql_read(
+        self, template: str, params: dict[str, Any], multirows: bool = False
+    ) -> dict[str, Any] | None | list[dict[str, Any]]:
+        """Run a direct SQL read against this graph's label tables.
+
+        Entity ids are compared as agtype strings, matching the expression
+        of the entity_idx_node_id index. No cypher() call is involved, so
+        the AGE search_path setup is skipped as well.
+        """
+        sql = SQL_TEMPLATES[template].format(graph_name=self.graph_name)
+        return await self.db.query(
+            sql,
+            {key: _json_dumps(value) for key, value in params.items()},
+            multirows=multirows,
+            statement=f"{template}:{self.graph_name}",
+        )
+
     async def has_node(self, node_id: str) -> bool:
-        entity_name_label = self._normalize_node_id(node_id)
+        if self.db.graph_read_mode == "sql":
+            record = await self._sql_read("graph_has_node", {"node_id": node_id})
+            return record["node_exists"]
 
         query = """SELECT * FROM cypher('%s', $$
-                     MATCH (n:base {entity_id: "%s"})
+                     MATCH (n:base {entity_id: $node_id})
                      RETURN count(n) > 0 AS node_exists
-                   $$) AS (node_exists bool)""" % (self.graph_name, entity_name_label)
+                   $$, $1) AS (node_exists bool)""" % self.graph_name
 
-        single_result = (await self._query(query))[0]
+        single_result = (
+            await self._query(query, params={"node_id": node_id}, statement="has_node")
+        )[0]
 
         return single_result["node_exists"]
 
     async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
-        src_label = self._normalize_node_id(source_node_id)
-        tgt_label = self._normalize_node_id(target_node_id)
+        if self.db.graph_read_mode == "sql":
+            record = await self._sql_read(
+                "graph_has_edge", {"src_id": source_node_id, "tgt_id": target_node_id}
+            )
+            return record["edge_exists"]
 
         query = """SELECT * FROM cypher('%s', $$
-                     MATCH (a:base {entity_id: "%s"})-[r]-(b:base {entity_id: "%s"})
+                     MATCH (a:base {entity_id: $src_id})-[r]-(b:base {entity_id: $tgt_id})
                      RETURN COUNT(r) > 0 AS edge_exists
-                   $$) AS (edge_exists bool)""" % (
-            self.graph_name,
-            src_label,
-            tgt_label,
-        )
+                   $$, $1) AS (edge_exists bool)""" % self.graph_name
 
-        single_result = (await self._query(query))[0]
+        single_result = (
+            await self._query(
+                query,
+                params={"src_id": source_node_id, "tgt_id": target_node_id},
+                statement="has_edge",
+            )
+        )[0]
 
         return single_result["edge_exists"]
 
     async def get_node(self, node_id: str) -> dict[str, str] | None:
         """Get node by its label identifier, return only node properties"""
+        if self.db.graph_read_mode == "sql":
+            record = await self._sql_read("graph_get_node", {"node_id": node_id})
+            return _json_loads(record["properties"]) if record else None
 
-        label = self._normalize_node_id(node_id)
         query = """SELECT * FROM cypher('%s', $$
-                     MATCH (n:base {entity_id: "%s"})
+                     MATCH (n:base {entity_id: $node_id})
                      RETURN n
-                   $$) AS (n agtype)""" % (self.graph_name, label)
-        record = await self._query(query)
+                   $$, $1) AS (n agtype)""" % self.graph_name
+        record = await self._query(
+            query, params={"node_id": node_id}, statement="get_node"
+        )
         if record:
             node = record[0]
             node_dict = node["n"]["properties"]
@@ -2907,13 +3366,19 @@ class PGGraphStorage(BaseGraphStorage):
         return None
 
     async def node_degree(self, node_id: str) -> int:
-        label = self._normalize_node_id(node_id)
+        if self.db.graph_read_mode == "sql":
+            record = await self._sql_read("graph_node_degree", {"node_id": node_id})
+            return int(record["total_edge_count"])
 
         query = """SELECT * FROM cypher('%s', $$
-                     MATCH (n:base {entity_id: "%s"})-[r]-()
+                     MATCH (n:base {entity_id: $node_id})-[r]-()
                      RETURN count(r) AS total_edge_count
-                   $$) AS (total_edge_count integer)""" % (self.graph_name, label)
-        record = (await self._query(query))[0]
+                   $$, $1) AS (total_edge_count integer)""" % self.graph_name
+        record = (
+            await self._query(
+                query, params={"node_id": node_id}, statement="node_degree"
+            )
+        )[0]
         if record:
             edge_count = int(record["total_edge_count"])
             return edge_count
@@ -2934,20 +3399,24 @@ class PGGraphStorage(BaseGraphStorage):
         self, source_node_id: str, target_node_id: str
     ) -> dict[str, str] | None:
         """Get edge properties between two nodes"""
-
-        src_label = self._normalize_node_id(source_node_id)
-        tgt_label = self._normalize_node_id(target_node_id)
+        if self.db.graph_read_mode == "sql":
+            record = await self._sql_read(
+                "graph_get_edge", {"src_id": source_node_id, "tgt_id": target_node_id}
+            )
+            if record and record["edge_properties"]:
+                return _json_loads(record["edge_properties"])
+            return None
 
         query = """SELECT * FROM cypher('%s', $$
-                     MATCH (a:base {entity_id: "%s"})-[r]-(b:base {entity_id: "%s"})
+                     MATCH (a:base {entity_id: $src_id})-[r]-(b:base {entity_id: $tgt_id})
                      RETURN properties(r) as edge_properties
                      LIMIT 1
-                   $$) AS (edge_properties agtype)""" % (
-            self.graph_name,
-            src_label,
-            tgt_label,
+                   $$, $1) AS (edge_properties agtype)""" % self.graph_name
+        record = await self._query(
+            query,
+            params={"src_id": source_node_id, "tgt_id": target_node_id},
+            statement="get_edge",
         )
-        record = await self._query(query)
         if record and record[0] and record[0]["edge_properties"]:
             result = record[0]["edge_properties"]
 
@@ -2965,18 +3434,15 @@ class PGGraphStorage(BaseGraphStorage):
         Retrieves all edges (relationships) for a particular node identified by its label.
         :return: list of dictionaries containing edge information
         """
-        label = self._normalize_node_id(source_node_id)
-
         query = """SELECT * FROM cypher('%s', $$
-                      MATCH (n:base {entity_id: "%s"})
+                      MATCH (n:base {entity_id: $node_id})
                       OPTIONAL MATCH (n)-[]-(connected:base)
                       RETURN n.entity_id AS source_id, connected.entity_id AS connected_id
-                    $$) AS (source_id text, connected_id text)""" % (
-            self.graph_name,
-            label,
-        )
+                    $$, $1) AS (source_id text, connected_id text)""" % self.graph_name
 
-        results = await self._query(query)
+        results = await self._query(
+            query, params={"node_id": source_node_id}, statement="get_node_edges"
+        )
         edges = []
         for record in results:
             source_id = record["source_id"]
@@ -3005,21 +3471,20 @@ class PGGraphStorage(BaseGraphStorage):
                 "PostgreSQL: node properties must contain an 'entity_id' field"
             )
 
-        label = self._normalize_node_id(node_id)
-        properties = self._format_properties(node_data)
-
         query = """SELECT * FROM cypher('%s', $$
-                     MERGE (n:base {entity_id: "%s"})
-                     SET n += %s
+                     MERGE (n:base {entity_id: $node_id})
+                     SET n += $properties
                      RETURN n
-                   $$) AS (n agtype)""" % (
-            self.graph_name,
-            label,
-            properties,
-        )
+                   $$, $1) AS (n agtype)""" % self.graph_name
 
         try:
-            await self._query(query, readonly=False, upsert=True)
+            await self._query(
+                query,
+                readonly=False,
+                upsert=True,
+                params={"node_id": node_id, "properties": node_data},
+                statement="upsert_node",
+            )
 
         except Exception:
             logger.error(f"POSTGRES, upsert_node error on node_id: `{node_id}`")
@@ -3041,28 +3506,30 @@ class PGGraphStorage(BaseGraphStorage):
             target_node_id (str): Label of the target node (used as identifier)
             edge_data (dict): dictionary of properties to set on the edge
         """
-        src_label = self._normalize_node_id(source_node_id)
-        tgt_label = self._normalize_node_id(target_node_id)
-        edge_properties = self._format_properties(edge_data)
-
+        # The properties are set twice on purpose:
+        # https://github.com/HKUDS/LightRAG/issues/1438#issuecomment-2826000195
         query = """SELECT * FROM cypher('%s', $$
-                     MATCH (source:base {entity_id: "%s"})
+                     MATCH (source:base {entity_id: $src_id})
                      WITH source
-                     MATCH (target:base {entity_id: "%s"})
+                     MATCH (target:base {entity_id: $tgt_id})
                      MERGE (source)-[r:DIRECTED]-(target)
-                     SET r += %s
-                     SET r += %s
+                     SET r += $properties
+                     SET r += $properties
                      RETURN r
-                   $$) AS (r agtype)""" % (
-            self.graph_name,
-            src_label,
-            tgt_label,
-            edge_properties,
-            edge_properties,  # https://github.com/HKUDS/LightRAG/issues/1438#issuecomment-2826000195
-        )
+                   $$, $1) AS (r agtype)""" % self.graph_name
 
         try:
-            await self._query(query, readonly=False, upsert=True)
+            await self._query(
+                query,
+                readonly=False,
+                upsert=True,
+                params={
+                    "src_id": source_node_id,
+                    "tgt_id": target_node_id,
+                    "properties": edge_data,
+                },
+                statement="upsert_edge",
+            )
 
         except Exception:
             logger.error(
@@ -3070,6 +3537,98 @@ class PGGraphStorage(BaseGraphStorage):
             )
             raise
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((PGGraphQueryException,)),
+    )
+    async def _upsert_batch(
+        self, query: str, batch: list[dict[str, Any]], statement: str
+    ) -> None:
+        await self._query(
+            query,
+            readonly=False,
+            upsert=True,
+            params={"batch": batch},
+            statement=statement,
+        )
+
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        """
+        Upsert many nodes, ``graph_upsert_batch_size`` per Cypher statement.
+
+        Args:
+            nodes: dictionary mapping node ids to their properties, as passed
+                to upsert_node
+        """
+        if not nodes:
+            return
+        for node_id, node_data in nodes.items():
+            if "entity_id" not in node_data:
+                raise ValueError(
+                    f"PostgreSQL: node properties must contain an 'entity_id' field (node `{node_id}`)"
+                )
+
+        query = """SELECT * FROM cypher('%s', $$
+                     UNWIND $batch AS row
+                     MERGE (n:base {entity_id: row.node_id})
+                     SET n += row.properties
+                   $$, $1) AS (n agtype)""" % self.graph_name
+
+        rows = [
+            {"node_id": node_id, "properties": node_data}
+            for node_id, node_data in nodes.items()
+        ]
+        batch_size = self.db.graph_upsert_batch_size
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i : i + batch_size]
+            try:
+                await self._upsert_batch(query, batch, "upsert_nodes_batch")
+            except Exception:
+                logger.error(
+                    f"POSTGRES, upsert_nodes_batch error on {len(batch)} nodes starting at `{batch[0]['node_id']}`"
+                )
+                raise
+
+    async def upsert_edges_batch(
+        self, edges: list[tuple[str, str, dict[str, str]]]
+    ) -> None:
+        """
+        Upsert many edges, ``graph_upsert_batch_size`` per Cypher statement.
+
+        Args:
+            edges: list of (source_node_id, target_node_id, edge_data) tuples,
+                as passed to upsert_edge. Both nodes must already exist.
+        """
+        if not edges:
+            return
+
+        # The properties are set twice on purpose, as in upsert_edge
+        query = """SELECT * FROM cypher('%s', $$
+                     UNWIND $batch AS row
+                     MATCH (source:base {entity_id: row.src_id})
+                     MATCH (target:base {entity_id: row.tgt_id})
+                     MERGE (source)-[r:DIRECTED]-(target)
+                     SET r += row.properties
+                     SET r += row.properties
+                   $$, $1) AS (r agtype)""" % self.graph_name
+
+        rows = [
+            {"src_id": src_id, "tgt_id": tgt_id, "properties": edge_data}
+            for src_id, tgt_id, edge_data in edges
+        ]
+        batch_size = self.db.graph_upsert_batch_size
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i : i + batch_size]
+            try:
+                await self._upsert_batch(query, batch, "upsert_edges_batch")
+            except Exception:
+                logger.error(
+                    f"POSTGRES, upsert_edges_batch error on {len(batch)} edges starting at "
+                    f"`{batch[0]['src_id']}`-`{batch[0]['tgt_id']}`"
+                )
+                raise
+
     async def delete_node(self, node_id: str) -> None:
         """
         Delete a node from the graph.
@@ -3077,15 +3636,18 @@ class PGGraphStorage(BaseGraphStorage):
         Args:
             node_id (str): The ID of the node to delete.
         """
-        label = self._normalize_node_id(node_id)
-
         query = """SELECT * FROM cypher('%s', $$
-                     MATCH (n:base {entity_id: "%s"})
+                     MATCH (n:base {entity_id: $node_id})
                      DETACH DELETE n
-                   $$) AS (n agtype)""" % (self.graph_name, label)
+                   $$, $1) AS (n agtype)""" % self.graph_name
 
         try:
-            await self._query(query, readonly=False)
+            await self._query(
+                query,
+                readonly=False,
+                params={"node_id": node_id},
+                statement="delete_node",
+            )
         except Exception as e:
             logger.error("Error during node deletion: {%s}", e)
             raise
@@ -3097,17 +3659,19 @@ class PGGraphStorage(BaseGraphStorage):
         Args:
             node_ids (list[str]): A list of node IDs to remove.
         """
-        node_ids = [self._normalize_node_id(node_id) for node_id in node_ids]
-        node_id_list = ", ".join([f'"{node_id}"' for node_id in node_ids])
-
         query = """SELECT * FROM cypher('%s', $$
                      MATCH (n:base)
-                     WHERE n.entity_id IN [%s]
+                     WHERE n.entity_id IN $node_ids
                      DETACH DELETE n
-                   $$) AS (n agtype)""" % (self.graph_name, node_id_list)
+                   $$, $1) AS (n agtype)""" % self.graph_name
 
         try:
-            await self._query(query, readonly=False)
+            await self._query(
+                query,
+                readonly=False,
+                params={"node_ids": list(node_ids)},
+                statement="remove_nodes",
+            )
         except Exception as e:
             logger.error("Error during node removal: {%s}", e)
             raise
@@ -3119,17 +3683,19 @@ class PGGraphStorage(BaseGraphStorage):
         Args:
             edges (list[tuple[str, str]]): A list of edges to remove, where each edge is a tuple of (source_node_id, target_node_id).
         """
-        for source, target in edges:
-            src_label = self._normalize_node_id(source)
-            tgt_label = self._normalize_node_id(target)
-
-            query = """SELECT * FROM cypher('%s', $$
-                         MATCH (a:base {entity_id: "%s"})-[r]-(b:base {entity_id: "%s"})
-                         DELETE r
-                       $$) AS (r agtype)""" % (self.graph_name, src_label, tgt_label)
+        query = """SELECT * FROM cypher('%s', $$
+                     MATCH (a:base {entity_id: $src_id})-[r]-(b:base {entity_id: $tgt_id})
+                     DELETE r
+                   $$, $1) AS (r agtype)""" % self.graph_name
 
+        for source, target in edges:
             try:
-                await self._query(query, readonly=False)
+                await self._query(
+                    query,
+                    readonly=False,
+                    params={"src_id": source, "tgt_id": target},
+                    statement="remove_edge",
+                )
                 logger.debug(f"Deleted edge from '{source}' to '{target}'")
             except Exception as e:
                 logger.error(f"Error during edge deletion: {str(e)}")
@@ -3148,18 +3714,15 @@ class PGGraphStorage(BaseGraphStorage):
         if not node_ids:
             return {}
 
-        # Format node IDs for the query
-        formatted_ids = ", ".join(
-            ['"' + self._normalize_node_id(node_id) + '"' for node_id in node_ids]
-        )
-
         query = """SELECT * FROM cypher('%s', $$
-                     UNWIND [%s] AS node_id
+                     UNWIND $node_ids AS node_id
                      MATCH (n:base {entity_id: node_id})
                      RETURN node_id, n
-                   $$) AS (node_id text, n agtype)""" % (self.graph_name, formatted_ids)
+                   $$, $1) AS (node_id text, n agtype)""" % self.graph_name
 
-        results = await self._query(query)
+        results = await self._query(
+            query, params={"node_ids": list(node_ids)}, statement="get_nodes_batch"
+        )
 
         # Build result dictionary
         nodes_dict = {}
@@ -3186,11 +3749,31 @@ class PGGraphStorage(BaseGraphStorage):
 
         return nodes_dict
 
+    async def _query_node_batches(
+        self, query: str, node_ids: list[str], statement: str
+    ) -> list[dict[str, Any]]:
+        """Run ``query`` over ``node_ids`` in graph_read_batch_size chunks.
+
+        The chunks are independent, so they run concurrently; the rows are
+        returned in chunk order.
+        """
+        batch_size = self.db.graph_read_batch_size
+        chunks = [
+            node_ids[i : i + batch_size] for i in range(0, len(node_ids), batch_size)
+        ]
+        results = await asyncio.gather(
+            *[
+                self._query(query, params={"node_ids": chunk}, statement=statement)
+                for chunk in chunks
+            ]
+        )
+        return [row for rows in results for row in rows]
+
     async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
         """
         Retrieve the degree for multiple nodes in a single query using UNWIND.
-        Calculates the total degree by counting distinct relationships.
-        Uses separate queries for outgoing and incoming edges.
+        Calculates the total degree by counting outgoing and incoming
+        relationships separately within the same statement.
 
         Args:
             node_ids: List of node labels (entity_id values) to look up.
@@ -3202,52 +3785,25 @@ class PGGraphStorage(BaseGraphStorage):
         if not node_ids:
             return {}
 
-        # Format node IDs for the query
-        formatted_ids = ", ".join(
-            ['"' + self._normalize_node_id(node_id) + '"' for node_id in node_ids]
-        )
-
-        outgoing_query = """SELECT * FROM cypher('%s', $$
-                     UNWIND [%s] AS node_id
-                     MATCH (n:base {entity_id: node_id})
-                     OPTIONAL MATCH (n)-[r]->(a)
-                     RETURN node_id, count(a) AS out_degree
-                   $$) AS (node_id text, out_degree bigint)""" % (
-            self.graph_name,
-            formatted_ids,
-        )
-
-        incoming_query = """SELECT * FROM cypher('%s', $$
-                     UNWIND [%s] AS node_id
+        query = """SELECT * FROM cypher('%s', $$
+                     UNWIND $node_ids AS node_id
                      MATCH (n:base {entity_id: node_id})
-                     OPTIONAL MATCH (n)<-[r]-(b)
-                     RETURN node_id, count(b) AS in_degree
-                   $$) AS (node_id text, in_degree bigint)""" % (
-            self.graph_name,
-            formatted_ids,
+                     OPTIONAL MATCH (n)-[]->(a)
+                     WITH node_id, n, count(a) AS out_degree
+                     OPTIONAL MATCH (n)<-[]-(b)
+                     RETURN node_id, out_degree + count(b) AS degree
+                   $$, $1) AS (node_id text, degree bigint)""" % self.graph_name
+
+        results = await self._query_node_batches(
+            query, list(node_ids), "node_degrees_batch"
         )
 
-        outgoing_results = await self._query(outgoing_query)
-        incoming_results = await self._query(incoming_query)
-
-        out_degrees = {}
-        in_degrees = {}
-
-        for result in outgoing_results:
-            if result["node_id"] is not None:
-                out_degrees[result["node_id"]] = int(result["out_degree"])
-
-        for result in incoming_results:
+        degrees = {}
+        for result in results:
             if result["node_id"] is not None:
-                in_degrees[result["node_id"]] = int(result["in_degree"])
+                degrees[result["node_id"]] = int(result["degree"])
 
-        degrees_dict = {}
-        for node_id in node_ids:
-            out_degree = out_degrees.get(node_id, 0)
-            in_degree = in_degrees.get(node_id, 0)
-            degrees_dict[node_id] = out_degree + in_degree
-
-        return degrees_dict
+        return {node_id: degrees.get(node_id, 0) for node_id in node_ids}
 
     async def edge_degrees_batch(
         self, edges: list[tuple[str, str]]
@@ -3298,31 +3854,31 @@ class PGGraphStorage(BaseGraphStorage):
         if not pairs:
             return {}
 
-        src_nodes = []
-        tgt_nodes = []
-        for pair in pairs:
-            src_nodes.append(self._normalize_node_id(pair["src"]))
-            tgt_nodes.append(self._normalize_node_id(pair["tgt"]))
-
-        src_array = ", ".join([f'"{src}"' for src in src_nodes])
-        tgt_array = ", ".join([f'"{tgt}"' for tgt in tgt_nodes])
+        params = {
+            "sources": [pair["src"] for pair in pairs],
+            "targets": [pair["tgt"] for pair in pairs],
+        }
 
         forward_query = f"""SELECT * FROM cypher('{self.graph_name}', $$
-                     WITH [{src_array}] AS sources, [{tgt_array}] AS targets
+                     WITH $sources AS sources, $targets AS targets
                      UNWIND range(0, size(sources)-1) AS i
                      MATCH (a:base {{entity_id: sources[i]}})-[r]->(b:base {{entity_id: targets[i]}})
                      RETURN sources[i] AS source, targets[i] AS target, properties(r) AS edge_properties
-                   $$) AS (source text, target text, edge_properties agtype)"""
+                   $$, $1) AS (source text, target text, edge_properties agtype)"""
 
         backward_query = f"""SELECT * FROM cypher('{self.graph_name}', $$
-                     WITH [{src_array}] AS sources, [{tgt_array}] AS targets
+                     WITH $sources AS sources, $targets AS targets
                      UNWIND range(0, size(sources)-1) AS i
                      MATCH (a:base {{entity_id: sources[i]}})<-[r]-(b:base {{entity_id: targets[i]}})
                      RETURN sources[i] AS source, targets[i] AS target, properties(r) AS edge_properties
-                   $$) AS (source text, target text, edge_properties agtype)"""
+                   $$, $1) AS (source text, target text, edge_properties agtype)"""
 
-        forward_results = await self._query(forward_query)
-        backward_results = await self._query(backward_query)
+        forward_results = await self._query(
+            forward_query, params=params, statement="get_edges_batch_forward"
+        )
+        backward_results = await self._query(
+            backward_query, params=params, statement="get_edges_batch_backward"
+        )
 
         edges_dict = {}
 
@@ -3375,49 +3931,46 @@ class PGGraphStorage(BaseGraphStorage):
         if not node_ids:
             return {}
 
-        # Format node IDs for the query
-        formatted_ids = ", ".join(
-            ['"' + self._normalize_node_id(node_id) + '"' for node_id in node_ids]
-        )
-
-        outgoing_query = """SELECT * FROM cypher('%s', $$
-                     UNWIND [%s] AS node_id
+        # The two directed matches the separate outgoing/incoming queries
+        # used to run, in one statement; a self-loop still shows up once in
+        # each direction and rows keep each branch's order
+        query = """SELECT node_id, connected_id, true AS is_outgoing FROM cypher('%s', $$
+                     UNWIND $node_ids AS node_id
                      MATCH (n:base {entity_id: node_id})
                      OPTIONAL MATCH (n:base)-[]->(connected:base)
                      RETURN node_id, connected.entity_id AS connected_id
-                   $$) AS (node_id text, connected_id text)""" % (
-            self.graph_name,
-            formatted_ids,
-        )
-
-        incoming_query = """SELECT * FROM cypher('%s', $$
-                     UNWIND [%s] AS node_id
+                   $$, $1) AS (node_id text, connected_id text)
+                   UNION ALL
+                   SELECT node_id, connected_id, false AS is_outgoing FROM cypher('%s', $$
+                     UNWIND $node_ids AS node_id
                      MATCH (n:base {entity_id: node_id})
                      OPTIONAL MATCH (n:base)<-[]-(connected:base)
                      RETURN node_id, connected.entity_id AS connected_id
-                   $$) AS (node_id text, connected_id text)""" % (
+                   $$, $1) AS (node_id text, connected_id text)""" % (
+            self.graph_name,
             self.graph_name,
-            formatted_ids,
         )
 
-        outgoing_results = await self._query(outgoing_query)
-        incoming_results = await self._query(incoming_query)
-
-        nodes_edges_dict = {node_id: [] for node_id in node_ids}
-
-        for result in outgoing_results:
-            if result["node_id"] and result["connected_id"]:
-                nodes_edges_dict[result["node_id"]].append(
-                    (result["node_id"], result["connected_id"])
-                )
+        results = await self._query_node_batches(
+            query, list(node_ids), "get_nodes_edges_batch"
+        )
 
-        for result in incoming_results:
-            if result["node_id"] and result["connected_id"]:
-                nodes_edges_dict[result["node_id"]].append(
-                    (result["connected_id"], result["node_id"])
-                )
+        outgoing_edges = {node_id: [] for node_id in node_ids}
+        incoming_edges = {node_id: [] for node_id in node_ids}
+        for result in results:
+            node_id = result["node_id"]
+            connected_id = result["connected_id"]
+            if not (node_id and connected_id):
+                continue
+            if result["is_outgoing"]:
+                outgoing_edges[node_id].append((node_id, connected_id))
+            else:
+                incoming_edges[node_id].append((connected_id, node_id))
 
-        return nodes_edges_dict
+        return {
+            node_id: outgoing_edges[node_id] + incoming_edges[node_id]
+            for node_id in node_ids
+        }
 
     async def get_all_labels(self) -> list[str]:
         """
@@ -3436,7 +3989,7 @@ class PGGraphStorage(BaseGraphStorage):
             % self.graph_name
         )
 
-        results = await self._query(query)
+        results = await self._query(query, statement="get_all_labels")
         labels = []
         for result in results:
             if result and isinstance(result, dict) and "label" in result:
@@ -3449,18 +4002,19 @@ class PGGraphStorage(BaseGraphStorage):
         This method uses a Cypher query with UNWIND to efficiently find all nodes
         where the `source_id` property contains any of the specified chunk IDs.
         """
-        # The string representation of the list for the cypher query
-        chunk_ids_str = json.dumps(chunk_ids)
-
         query = f"""
             SELECT * FROM cypher('{self.graph_name}', $$
-                UNWIND {chunk_ids_str} AS chunk_id
+                UNWIND $chunk_ids AS chunk_id
                 MATCH (n:base)
                 WHERE n.source_id IS NOT NULL AND chunk_id IN split(n.source_id, '{GRAPH_FIELD_SEP}')
                 RETURN n
-            $$) AS (n agtype);
+            $$, $1) AS (n agtype);
         """
-        results = await self._query(query)
+        results = await self._query(
+            query,
+            params={"chunk_ids": list(chunk_ids)},
+            statement="get_nodes_by_chunk_ids",
+        )
 
         # Build result list
         nodes = []
@@ -3488,17 +4042,19 @@ class PGGraphStorage(BaseGraphStorage):
         This method uses a Cypher query with UNWIND to efficiently find all edges
         where the `source_id` property contains any of the specified chunk IDs.
         """
-        chunk_ids_str = json.dumps(chunk_ids)
-
         query = f"""
             SELECT * FROM cypher('{self.graph_name}', $$
-                UNWIND {chunk_ids_str} AS chunk_id
+                UNWIND $chunk_ids AS chunk_id
                 MATCH ()-[r]-()
                 WHERE r.source_id IS NOT NULL AND chunk_id IN split(r.source_id, '{GRAPH_FIELD_SEP}')
                 RETURN DISTINCT r, startNode(r) AS source, endNode(r) AS target
-            $$) AS (edge agtype, source agtype, target agtype);
+            $$, $1) AS (edge agtype, source agtype, target agtype);
         """
-        results = await self._query(query)
+        results = await self._query(
+            query,
+            params={"chunk_ids": list(chunk_ids)},
+            statement="get_edges_by_chunk_ids",
+        )
         edges = []
         if results:
             for item in results:
@@ -3555,6 +4111,9 @@ class PGGraphStorage(BaseGraphStorage):
         Returns:
             KnowledgeGraph object containing nodes and edges
         """
+        if self.db.graph_traversal_mode == "server":
+            return await self._bfs_subgraph_server(node_label, max_depth, max_nodes)
+
         from collections import deque
 
         result = KnowledgeGraph()
@@ -3564,13 +4123,14 @@ class PGGraphStorage(BaseGraphStorage):
         visited_edge_pairs = set()
 
         # Get starting node data
-        label = self._normalize_node_id(node_label)
         query = """SELECT * FROM cypher('%s', $$
-                    MATCH (n:base {entity_id: "%s"})
+                    MATCH (n:base {entity_id: $node_id})
                     RETURN id(n) as node_id, n
-                  $$) AS (node_id bigint, n agtype)""" % (self.graph_name, label)
+                  $$, $1) AS (node_id bigint, n agtype)""" % self.graph_name
 
-        node_result = await self._query(query)
+        node_result = await self._query(
+            query, params={"node_id": node_label}, statement="bfs_start_node"
+        )
         if not node_result or not node_result[0].get("n"):
             return result
 
@@ -3620,13 +4180,10 @@ class PGGraphStorage(BaseGraphStorage):
 
             # Prepare node IDs list
             node_ids = [node.labels[0] for node in current_level_nodes]
-            formatted_ids = ", ".join(
-                [f'"{self._normalize_node_id(node_id)}"' for node_id in node_ids]
-            )
 
             # Construct batch query for outgoing edges
             outgoing_query = f"""SELECT * FROM cypher('{self.graph_name}', $$
-                UNWIND [{formatted_ids}] AS node_id
+                UNWIND $node_ids AS node_id
                 MATCH (n:base {{entity_id: node_id}})
                 OPTIONAL MATCH (n)-[r]->(neighbor:base)
                 RETURN node_id AS current_id,
@@ -3637,12 +4194,12 @@ class PGGraphStorage(BaseGraphStorage):
                        r,
                        neighbor,
                        true AS is_outgoing
-              $$) AS (current_id text, current_internal_id bigint, neighbor_internal_id bigint,
+              $$, $1) AS (current_id text, current_internal_id bigint, neighbor_internal_id bigint,
                       neighbor_id text, edge_id bigint, r agtype, neighbor agtype, is_outgoing bool)"""
 
             # Construct batch query for incoming edges
             incoming_query = f"""SELECT * FROM cypher('{self.graph_name}', $$
-                UNWIND [{formatted_ids}] AS node_id
+                UNWIND $node_ids AS node_id
                 MATCH (n:base {{entity_id: node_id}})
                 OPTIONAL MATCH (n)<-[r]-(neighbor:base)
                 RETURN node_id AS current_id,
@@ -3653,12 +4210,17 @@ class PGGraphStorage(BaseGraphStorage):
                        r,
                        neighbor,
                        false AS is_outgoing
-              $$) AS (current_id text, current_internal_id bigint, neighbor_internal_id bigint,
+              $$, $1) AS (current_id text, current_internal_id bigint, neighbor_internal_id bigint,
                       neighbor_id text, edge_id bigint, r agtype, neighbor agtype, is_outgoing bool)"""
 
             # Execute queries
-            outgoing_results = await self._query(outgoing_query)
-            incoming_results = await self._query(incoming_query)
+            params = {"node_ids": node_ids}
+            outgoing_results = await self._query(
+                outgoing_query, params=params, statement="bfs_outgoing"
+            )
+            incoming_results = await self._query(
+                incoming_query, params=params, statement="bfs_incoming"
+            )
 
             # Combine results
             neighbors = outgoing_results + incoming_results
@@ -3748,6 +4310,64 @@ class PGGraphStorage(BaseGraphStorage):
 
         return result
 
+    async def _bfs_subgraph_server(
+        self, node_label: str, max_depth: int, max_nodes: int
+    ) -> KnowledgeGraph:
+        """
+        Breadth-first subgraph retrieval computed by the database.
+
+        A recursive CTE walks the DIRECTED table in both directions using node
+        and edge ids only, keeps the max_nodes nodes closest to the start
+        (ties broken by id) and the edges among them, and reads properties
+        for that surviving set alone, all in one statement.
+
+        Args:
+            node_label: Label of the starting node
+            max_depth: Maximum depth of the subgraph
+            max_nodes: Maximum number of nodes to return
+
+        Returns:
+            KnowledgeGraph object containing nodes and edges
+        """
+        sql = SQL_TEMPLATES["graph_bfs_subgraph"].format(graph_name=self.graph_name)
+        rows = await self.db.query(
+            sql,
+            {
+                "node_id": _json_dumps(node_label),
+                "max_depth": max_depth,
+                "max_nodes": max_nodes,
+            },
+            multirows=True,
+            statement=f"graph_bfs_subgraph:{self.graph_name}",
+        )
+
+        result = KnowledgeGraph()
+        total_nodes = 0
+        for row in rows:
+            properties = _json_loads(row["properties"]) if row["properties"] else {}
+            if row["kind"] == "node":
+                total_nodes = row["total_nodes"]
+                result.nodes.append(
+                    KnowledgeGraphNode(
+                        id=row["id"],
+                        labels=[properties.get("entity_id")],
+                        properties=properties,
+                    )
+                )
+            else:
+                result.edges.append(
+                    KnowledgeGraphEdge(
+                        id=row["id"],
+                        type="DIRECTED",
+                        source=row["start_id"],
+                        target=row["end_id"],
+                        properties=properties,
+                    )
+                )
+
+        result.is_truncated = total_nodes > max_nodes
+        return result
+
     async def get_knowledge_graph(
         self,
         node_label: str,
@@ -3782,7 +4402,7 @@ class PGGraphStorage(BaseGraphStorage):
                     RETURN count(distinct n) AS total_nodes
                     $$) AS (total_nodes bigint)"""
 
-            count_result = await self._query(count_query)
+            count_result = await self._query(count_query, statement="count_nodes")
             total_nodes = count_result[0]["total_nodes"] if count_result else 0
             is_truncated = total_nodes > max_nodes
 
@@ -3793,25 +4413,33 @@ class PGGraphStorage(BaseGraphStorage):
                     RETURN id(n) as node_id, count(r) as degree
                 $$) AS (node_id BIGINT, degree BIGINT)
                 ORDER BY degree DESC
-                LIMIT {max_nodes}"""
-            node_results = await self._query(query_nodes)
+                LIMIT $1"""
+            node_results = await self.db.query(
+                query_nodes,
+                {"max_nodes": max_nodes},
+                multirows=True,
+                with_age=True,
+                graph_name=self.graph_name,
+                statement="graph_top_degree_nodes",
+            )
 
-            node_ids = [str(result["node_id"]) for result in node_results]
+            node_ids = [result["node_id"] for result in node_results]
 
             logger.info(f"Total nodes: {total_nodes}, Selected nodes: {len(node_ids)}")
 
             if node_ids:
-                formatted_ids = ", ".join(node_ids)
                 # Construct batch query for subgraph within max_nodes
                 query = f"""SELECT * FROM cypher('{self.graph_name}', $$
-                        WITH [{formatted_ids}] AS node_ids
+                        WITH $node_ids AS node_ids
                         MATCH (a)
                         WHERE id(a) IN node_ids
                         OPTIONAL MATCH (a)-[r]->(b)
                             WHERE id(b) IN node_ids
                         RETURN a, r, b
-                    $$) AS (a AGTYPE, r AGTYPE, b AGTYPE)"""
-                results = await self._query(query)
+                    $$, $1) AS (a AGTYPE, r AGTYPE, b AGTYPE)"""
+                results = await self._query(
+                    query, params={"node_ids": node_ids}, statement="subgraph_by_ids"
+                )
 
                 # Process query results, deduplicate nodes and edges
                 nodes_dict = {}
@@ -3973,6 +4601,9 @@ def namespace_to_table_name(namespace: str) -> str:
             return v
 
 
+VECTOR_TABLES = ["LIGHTRAG_VDB_CHUNKS", "LIGHTRAG_VDB_ENTITY", "LIGHTRAG_VDB_RELATION"]
+
+
 TABLES = {
     "LIGHTRAG_DOC_FULL": {
         "ddl": """CREATE TABLE LIGHTRAG_DOC_FULL (
@@ -4122,19 +4753,19 @@ SQL_TEMPLATES = {
                            FROM LIGHTRAG_LLM_CACHE WHERE workspace=$1 AND mode=$2 AND id=$3
                           """,
     "get_by_ids_full_docs": """SELECT id, COALESCE(content, '') as content
-                                 FROM LIGHTRAG_DOC_FULL WHERE workspace=$1 AND id IN ({ids})
+                                 FROM LIGHTRAG_DOC_FULL WHERE workspace=$1 AND id = ANY($2::varchar[])
                             """,
     "get_by_ids_text_chunks": """SELECT id, tokens, COALESCE(content, '') as content,
                                   chunk_order_index, full_doc_id, file_path,
                                   COALESCE(llm_cache_list, '[]'::jsonb) as llm_cache_list,
                                   EXTRACT(EPOCH FROM create_time)::BIGINT as create_time,
                                   EXTRACT(EPOCH FROM update_time)::BIGINT as update_time
-                                   FROM LIGHTRAG_DOC_CHUNKS WHERE workspace=$1 AND id IN ({ids})
+                                   FROM LIGHTRAG_DOC_CHUNKS WHERE workspace=$1 AND id = ANY($2::varchar[])
                                 """,
     "get_by_ids_llm_response_cache": """SELECT id, original_prompt, return_value, mode, chunk_id, cache_type,
                                  EXTRACT(EPOCH FROM create_time)::BIGINT as create_time,
                                  EXTRACT(EPOCH FROM update_time)::BIGINT as update_time
-                                 FROM LIGHTRAG_LLM_CACHE WHERE workspace=$1 AND id IN ({ids})
+                                 FROM LIGHTRAG_LLM_CACHE WHERE workspace=$1 AND id = ANY($2::varchar[])
                                 """,
     "get_by_id_full_entities": """SELECT id, entity_names, count,
                                 EXTRACT(EPOCH FROM create_time)::BIGINT as create_time,
@@ -4149,21 +4780,27 @@ SQL_TEMPLATES = {
     "get_by_ids_full_entities": """SELECT id, entity_names, count,
                                  EXTRACT(EPOCH FROM create_time)::BIGINT as create_time,
                                  EXTRACT(EPOCH FROM update_time)::BIGINT as update_time
-                                 FROM LIGHTRAG_FULL_ENTITIES WHERE workspace=$1 AND id IN ({ids})
+                                 FROM LIGHTRAG_FULL_ENTITIES WHERE workspace=$1 AND id = ANY($2::varchar[])
                                 """,
     "get_by_ids_full_relations": """SELECT id, relation_pairs, count,
                                  EXTRACT(EPOCH FROM create_time)::BIGINT as create_time,
                                  EXTRACT(EPOCH FROM update_time)::BIGINT as update_time
-                                 FROM LIGHTRAG_FULL_RELATIONS WHERE workspace=$1 AND id IN ({ids})
+                                 FROM LIGHTRAG_FULL_RELATIONS WHERE workspace=$1 AND id = ANY($2::varchar[])
                                 """,
-    "filter_keys": "SELECT id FROM {table_name} WHERE workspace=$1 AND id IN ({ids})",
+    "filter_keys": "SELECT id FROM {table_name} WHERE workspace=$1 AND id = ANY($2::varchar[])",
+    # Set-based KV upserts: $1 is the workspace, the following parameters are
+    # one array per column, expanded row-wise by unnest()
     "upsert_doc_full": """INSERT INTO LIGHTRAG_DOC_FULL (id, content, workspace)
-                        VALUES ($1, $2, $3)
+                        SELECT t.id, t.content, $1
+                        FROM unnest($2::varchar[], $3::text[]) AS t(id, content)
                         ON CONFLICT (workspace,id) DO UPDATE
-                           SET content = $2, update_time = CURRENT_TIMESTAMP
+                           SET content = EXCLUDED.content, update_time = CURRENT_TIMESTAMP
                        """,
     "upsert_llm_response_cache": """INSERT INTO LIGHTRAG_LLM_CACHE(workspace,id,original_prompt,return_value,mode,chunk_id,cache_type)
-                                      VALUES ($1, $2, $3, $4, $5, $6, $7)
+                                      SELECT $1, t.id, t.original_prompt, t.return_value, t.mode, t.chunk_id, t.cache_type
+                                      FROM unnest($2::varchar[], $3::text[], $4::text[], $5::varchar[],
+                                                  $6::varchar[], $7::varchar[])
+                                        AS t(id, original_prompt, return_value, mode, chunk_id, cache_type)
                                       ON CONFLICT (workspace,mode,id) DO UPDATE
                                       SET original_prompt = EXCLUDED.original_prompt,
                                       return_value=EXCLUDED.return_value,
@@ -4175,7 +4812,11 @@ SQL_TEMPLATES = {
     "upsert_text_chunk": """INSERT INTO LIGHTRAG_DOC_CHUNKS (workspace, id, tokens,
                       chunk_order_index, full_doc_id, content, file_path, llm_cache_list,
                       create_time, update_time)
-                      VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+                      SELECT $1, t.id, t.tokens, t.chunk_order_index, t.full_doc_id, t.content,
+                             t.file_path, t.llm_cache_list::jsonb, $9::timestamp, $9::timestamp
+                      FROM unnest($2::varchar[], $3::int[], $4::int[], $5::varchar[], $6::text[],
+                                  $7::text[], $8::text[])
+                        AS t(id, tokens, chunk_order_index, full_doc_id, content, file_path, llm_cache_list)
                       ON CONFLICT (workspace,id) DO UPDATE
                       SET tokens=EXCLUDED.tokens,
                       chunk_order_index=EXCLUDED.chunk_order_index,
@@ -4187,7 +4828,8 @@ SQL_TEMPLATES = {
                      """,
     "upsert_full_entities": """INSERT INTO LIGHTRAG_FULL_ENTITIES (workspace, id, entity_names, count,
                       create_time, update_time)
-                      VALUES ($1, $2, $3, $4, $5, $6)
+                      SELECT $1, t.id, t.entity_names::jsonb, t.count, $5::timestamp, $5::timestamp
+                      FROM unnest($2::varchar[], $3::text[], $4::int[]) AS t(id, entity_names, count)
                       ON CONFLICT (workspace,id) DO UPDATE
                       SET entity_names=EXCLUDED.entity_names,
                       count=EXCLUDED.count,
@@ -4195,17 +4837,36 @@ SQL_TEMPLATES = {
                      """,
     "upsert_full_relations": """INSERT INTO LIGHTRAG_FULL_RELATIONS (workspace, id, relation_pairs, count,
                       create_time, update_time)
-                      VALUES ($1, $2, $3, $4, $5, $6)
+                      SELECT $1, t.id, t.relation_pairs::jsonb, t.count, $5::timestamp, $5::timestamp
+                      FROM unnest($2::varchar[], $3::text[], $4::int[]) AS t(id, relation_pairs, count)
                       ON CONFLICT (workspace,id) DO UPDATE
                       SET relation_pairs=EXCLUDED.relation_pairs,
                       count=EXCLUDED.count,
                       update_time = EXCLUDED.update_time
                      """,
+    # All fields are updated from the input data in both INSERT and UPDATE cases
+    "upsert_doc_status": """INSERT INTO LIGHTRAG_DOC_STATUS(workspace,id,content_summary,content_length,chunks_count,status,file_path,chunks_list,track_id,metadata,error_msg,created_at,updated_at)
+                 VALUES($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12,$13)
+                  ON CONFLICT(id,workspace) DO UPDATE SET
+                  content_summary = EXCLUDED.content_summary,
+                  content_length = EXCLUDED.content_length,
+                  chunks_count = EXCLUDED.chunks_count,
+                  status = EXCLUDED.status,
+                  file_path = EXCLUDED.file_path,
+                  chunks_list = EXCLUDED.chunks_list,
+                  track_id = EXCLUDED.track_id,
+                  metadata = EXCLUDED.metadata,
+                  error_msg = EXCLUDED.error_msg,
+                  created_at = EXCLUDED.created_at,
+                  updated_at = EXCLUDED.updated_at
+                 """,
     # SQL for VectorStorage
-    "upsert_chunk": """INSERT INTO LIGHTRAG_VDB_CHUNKS (workspace, id, tokens,
+    "merge_chunk": """INSERT INTO LIGHTRAG_VDB_CHUNKS (workspace, id, tokens,
                       chunk_order_index, full_doc_id, content, content_vector, file_path,
                       create_time, update_time)
-                      VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+                      SELECT workspace, id, tokens, chunk_order_index, full_doc_id, content,
+                      content_vector, file_path, create_time, update_time
+                      FROM {staging_table}
                       ON CONFLICT (workspace,id) DO UPDATE
                       SET tokens=EXCLUDED.tokens,
                       chunk_order_index=EXCLUDED.chunk_order_index,
@@ -4215,9 +4876,11 @@ SQL_TEMPLATES = {
                       file_path=EXCLUDED.file_path,
                       update_time = EXCLUDED.update_time
                      """,
-    "upsert_entity": """INSERT INTO LIGHTRAG_VDB_ENTITY (workspace, id, entity_name, content,
+    "merge_entity": """INSERT INTO LIGHTRAG_VDB_ENTITY (workspace, id, entity_name, content,
                       content_vector, chunk_ids, file_path, create_time, update_time)
-                      VALUES ($1, $2, $3, $4, $5, $6::varchar[], $7, $8, $9)
+                      SELECT workspace, id, entity_name, content, content_vector,
+                      chunk_ids, file_path, create_time, update_time
+                      FROM {staging_table}
                       ON CONFLICT (workspace,id) DO UPDATE
                       SET entity_name=EXCLUDED.entity_name,
                       content=EXCLUDED.content,
@@ -4226,9 +4889,11 @@ SQL_TEMPLATES = {
                       file_path=EXCLUDED.file_path,
                       update_time=EXCLUDED.update_time
                      """,
-    "upsert_relationship": """INSERT INTO LIGHTRAG_VDB_RELATION (workspace, id, source_id,
+    "merge_relationship": """INSERT INTO LIGHTRAG_VDB_RELATION (workspace, id, source_id,
                       target_id, content, content_vector, chunk_ids, file_path, create_time, update_time)
-                      VALUES ($1, $2, $3, $4, $5, $6, $7::varchar[], $8, $9, $10)
+                      SELECT workspace, id, source_id, target_id, content, content_vector,
+                      chunk_ids, file_path, create_time, update_time
+                      FROM {staging_table}
                       ON CONFLICT (workspace,id) DO UPDATE
                       SET source_id=EXCLUDED.source_id,
                       target_id=EXCLUDED.target_id,
@@ -4246,7 +4911,7 @@ SQL_TEMPLATES = {
     )
     SELECT source_id as src_id, target_id as tgt_id, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at
     FROM (
-        SELECT r.id, r.source_id, r.target_id, r.create_time, 1 - (r.content_vector <=> '[{embedding_string}]'::vector) as distance
+        SELECT r.id, r.source_id, r.target_id, r.create_time, 1 - (r.content_vector <=> $5::vector) as distance
         FROM LIGHTRAG_VDB_RELATION r
         JOIN relevant_chunks c ON c.chunk_id = ANY(r.chunk_ids)
         WHERE r.workspace=$1
@@ -4263,7 +4928,7 @@ SQL_TEMPLATES = {
         )
         SELECT entity_name, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at FROM
             (
-                SELECT e.id, e.entity_name, e.create_time, 1 - (e.content_vector <=> '[{embedding_string}]'::vector) as distance
+                SELECT e.id, e.entity_name, e.create_time, 1 - (e.content_vector <=> $5::vector) as distance
                 FROM LIGHTRAG_VDB_ENTITY e
                 JOIN relevant_chunks c ON c.chunk_id = ANY(e.chunk_ids)
                 WHERE e.workspace=$1
@@ -4280,7 +4945,7 @@ SQL_TEMPLATES = {
         )
         SELECT id, content, file_path, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at FROM
             (
-                SELECT id, content, file_path, create_time, 1 - (content_vector <=> '[{embedding_string}]'::vector) as distance
+                SELECT id, content, file_path, create_time, 1 - (content_vector <=> $5::vector) as distance
                 FROM LIGHTRAG_VDB_CHUNKS
                 WHERE workspace=$1
                 AND id IN (SELECT chunk_id FROM relevant_chunks)
@@ -4289,8 +4954,260 @@ SQL_TEMPLATES = {
             ORDER BY distance DESC
             LIMIT $4
     """,
+    # ANN query templates: {distance} is the index-matching distance expression
+    # on $2; the threshold is applied outside the ordered, limited scan.
+    # The _filtered variants restrict to documents $5 through chunk ids, with
+    # ORDER BY re-applied because iterative scans may return relaxed order.
+    "relationships_ann": """
+        SELECT src_id, tgt_id, created_at FROM (
+            SELECT source_id as src_id, target_id as tgt_id,
+                EXTRACT(EPOCH FROM create_time)::BIGINT as created_at,
+                {distance} as distance
+            FROM LIGHTRAG_VDB_RELATION
+            WHERE workspace=$1
+            ORDER BY {distance}
+            LIMIT $4
+        ) candidates
+        WHERE 1 - distance > $3
+        ORDER BY distance
+    """,
+    "relationships_ann_filtered": """
+        WITH relevant_chunks AS (
+            SELECT array_agg(id)::varchar[] as chunk_ids
+            FROM LIGHTRAG_VDB_CHUNKS
+            WHERE workspace=$1 AND full_doc_id = ANY($5::varchar[])
+        )
+        SELECT src_id, tgt_id, created_at FROM (
+            SELECT source_id as src_id, target_id as tgt_id,
+                EXTRACT(EPOCH FROM create_time)::BIGINT as created_at,
+                {distance} as distance
+            FROM LIGHTRAG_VDB_RELATION
+            WHERE workspace=$1
+            AND chunk_ids && (SELECT chunk_ids FROM relevant_chunks)
+            ORDER BY {distance}
+            LIMIT $4
+        ) candidates
+        WHERE 1 - distance > $3
+        ORDER BY distance
+    """,
+    "entities_ann": """
+        SELECT entity_name, created_at FROM (
+            SELECT entity_name, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at,
+                {distance} as distance
+            FROM LIGHTRAG_VDB_ENTITY
+            WHERE workspace=$1
+            ORDER BY {distance}
+            LIMIT $4
+        ) candidates
+        WHERE 1 - distance > $3
+        ORDER BY distance
+    """,
+    "entities_ann_filtered": """
+        WITH relevant_chunks AS (
+            SELECT array_agg(id)::varchar[] as chunk_ids
+            FROM LIGHTRAG_VDB_CHUNKS
+            WHERE workspace=$1 AND full_doc_id = ANY($5::varchar[])
+        )
+        SELECT entity_name, created_at FROM (
+            SELECT entity_name, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at,
+                {distance} as distance
+            FROM LIGHTRAG_VDB_ENTITY
+            WHERE workspace=$1
+            AND chunk_ids && (SELECT chunk_ids FROM relevant_chunks)
+            ORDER BY {distance}
+            LIMIT $4
+        ) candidates
+        WHERE 1 - distance > $3
+        ORDER BY distance
+    """,
+    "chunks_ann": """
+        SELECT id, content, file_path, created_at FROM (
+            SELECT id, content, file_path, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at,
+                {distance} as distance
+            FROM LIGHTRAG_VDB_CHUNKS
+            WHERE workspace=$1
+            ORDER BY {distance}
+            LIMIT $4
+        ) candidates
+        WHERE 1 - distance > $3
+        ORDER BY distance
+    """,
+    "chunks_ann_filtered": """
+        SELECT id, content, file_path, created_at FROM (
+            SELECT id, content, file_path, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at,
+                {distance} as distance
+            FROM LIGHTRAG_VDB_CHUNKS
+            WHERE workspace=$1 AND full_doc_id = ANY($5::varchar[])
+            ORDER BY {distance}
+            LIMIT $4
+        ) candidates
+        WHERE 1 - distance > $3
+        ORDER BY distance
+    """,
+    # Quantized retrieval: {distance} orders candidates on the quantized index,
+    # $4 candidates are re-ranked by full-precision distance and cut to $5.
+    # {doc_filter} is empty or one of the *_doc_filter fragments on $6.
+    "relationships_quantized": """
+        SELECT src_id, tgt_id, created_at FROM (
+            SELECT src_id, tgt_id, created_at, content_vector <=> {query_vector}::vector as distance
+            FROM (
+                SELECT source_id as src_id, target_id as tgt_id,
+                    EXTRACT(EPOCH FROM create_time)::BIGINT as created_at, content_vector
+                FROM LIGHTRAG_VDB_RELATION
+                WHERE workspace=$1 {doc_filter}
+                ORDER BY {distance}
+                LIMIT $4
+            ) candidates
+        ) reranked
+        WHERE 1 - distance > $3
+        ORDER BY distance
+        LIMIT $5
+    """,
+    "entities_quantized": """
+        SELECT entity_name, created_at FROM (
+            SELECT entity_name, created_at, content_vector <=> {query_vector}::vector as distance
+            FROM (
+                SELECT entity_name, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at,
+                    content_vector
+                FROM LIGHTRAG_VDB_ENTITY
+                WHERE workspace=$1 {doc_filter}
+                ORDER BY {distance}
+                LIMIT $4
+            ) candidates
+        ) reranked
+        WHERE 1 - distance > $3
+        ORDER BY distance
+        LIMIT $5
+    """,
+    "chunks_quantized": """
+        SELECT id, content, file_path, created_at FROM (
+            SELECT id, content, file_path, created_at, content_vector <=> {query_vector}::vector as distance
+            FROM (
+                SELECT id, content, file_path,
+                    EXTRACT(EPOCH FROM create_time)::BIGINT as created_at, content_vector
+                FROM LIGHTRAG_VDB_CHUNKS
+                WHERE workspace=$1 {doc_filter}
+                ORDER BY {distance}
+                LIMIT $4
+            ) candidates
+        ) reranked
+        WHERE 1 - distance > $3
+        ORDER BY distance
+        LIMIT $5
+    """,
+    "chunk_ids_doc_filter": """AND chunk_ids && (
+                    SELECT array_agg(id)::varchar[] FROM LIGHTRAG_VDB_CHUNKS
+                    WHERE workspace=$1 AND full_doc_id = ANY($6::varchar[])
+                )""",
+    "chunks_doc_filter": "AND full_doc_id = ANY($6::varchar[])",
+    # Runs a search template once per query vector in $2. Each query's rows
+    # are numbered in the template's distance order and the outer ORDER BY
+    # keeps them grouped by query, nearest first.
+    "query_many": """
+        SELECT q.query_index, r.*
+        FROM unnest($2::vector[]) WITH ORDINALITY AS q(query_vector, query_index)
+        CROSS JOIN LATERAL (
+            SELECT hits.*, row_number() OVER () AS query_rank
+            FROM ({query}) hits
+        ) r
+        ORDER BY q.query_index, r.query_rank
+    """,
+    # Direct graph reads on the AGE label tables of graph {graph_name}. Entity
+    # ids are bound as agtype strings and matched with the expression indexed
+    # by entity_idx_node_id; edges use the DIRECTED start_id/end_id indexes.
+    "graph_has_node": """SELECT EXISTS (
+            SELECT 1 FROM "{graph_name}"."base"
+            WHERE ag_catalog.agtype_access_operator(properties, '"entity_id"'::ag_catalog.agtype)
+                OPERATOR(ag_catalog.=) $1::ag_catalog.agtype
+        ) AS node_exists""",
+    "graph_get_node": """SELECT properties::text AS properties
+        FROM "{graph_name}"."base"
+        WHERE ag_catalog.agtype_access_operator(properties, '"entity_id"'::ag_catalog.agtype)
+            OPERATOR(ag_catalog.=) $1::ag_catalog.agtype
+        LIMIT 1""",
+    "graph_node_degree": """SELECT COALESCE(SUM(
+            (SELECT count(*) FROM "{graph_name}"."DIRECTED" e WHERE e.start_id = n.id)
+            + (SELECT count(*) FROM "{graph_name}"."DIRECTED" e WHERE e.end_id = n.id)
+        ), 0)::bigint AS total_edge_count
+        FROM "{graph_name}"."base" n
+        WHERE ag_catalog.agtype_access_operator(n.properties, '"entity_id"'::ag_catalog.agtype)
+            OPERATOR(ag_catalog.=) $1::ag_catalog.agtype""",
+    "graph_has_edge": """WITH a AS (
+            SELECT id FROM "{graph_name}"."base"
+            WHERE ag_catalog.agtype_access_operator(properties, '"entity_id"'::ag_catalog.agtype)
+                OPERATOR(ag_catalog.=) $1::ag_catalog.agtype
+        ), b AS (
+            SELECT id FROM "{graph_name}"."base"
+            WHERE ag_catalog.agtype_access_operator(properties, '"entity_id"'::ag_catalog.agtype)
+                OPERATOR(ag_catalog.=) $2::ag_catalog.agtype
+        )
+        SELECT EXISTS (
+            SELECT 1 FROM "{graph_name}"."DIRECTED" e, a, b
+            WHERE (e.start_id = a.id AND e.end_id = b.id)
+               OR (e.start_id = b.id AND e.end_id = a.id)
+        ) AS edge_exists""",
+    "graph_get_edge": """WITH a AS (
+            SELECT id FROM "{graph_name}"."base"
+            WHERE ag_catalog.agtype_access_operator(properties, '"entity_id"'::ag_catalog.agtype)
+                OPERATOR(ag_catalog.=) $1::ag_catalog.agtype
+        ), b AS (
+            SELECT id FROM "{graph_name}"."base"
+            WHERE ag_catalog.agtype_access_operator(properties, '"entity_id"'::ag_catalog.agtype)
+                OPERATOR(ag_catalog.=) $2::ag_catalog.agtype
+        )
+        SELECT e.properties::text AS edge_properties
+        FROM "{graph_name}"."DIRECTED" e, a, b
+        WHERE (e.start_id = a.id AND e.end_id = b.id)
+           OR (e.start_id = b.id AND e.end_id = a.id)
+        LIMIT 1""",
+    # Server-side BFS from entity $1 up to depth $2: the walk only touches
+    # ids, the $3 nearest nodes (by depth, then id) survive, and properties
+    # are read for those nodes and the edges among them (one per node pair).
+    # Rows are nodes first in BFS order, then edges.
+    "graph_bfs_subgraph": """WITH RECURSIVE start_node AS (
+            SELECT id FROM "{graph_name}"."base"
+            WHERE ag_catalog.agtype_access_operator(properties, '"entity_id"'::ag_catalog.agtype)
+                OPERATOR(ag_catalog.=) $1::ag_catalog.agtype
+            LIMIT 1
+        ), walk(node_id, depth) AS (
+            SELECT id, 0 FROM start_node
+            UNION
+            SELECT neighbor.node_id, walk.depth + 1
+            FROM walk
+            CROSS JOIN LATERAL (
+                SELECT e.end_id FROM "{graph_name}"."DIRECTED" e WHERE e.start_id = walk.node_id
+                UNION ALL
+                SELECT e.start_id FROM "{graph_name}"."DIRECTED" e WHERE e.end_id = walk.node_id
+            ) AS neighbor(node_id)
+            WHERE walk.depth < $2
+        ), reached AS (
+            SELECT node_id, min(depth) AS depth FROM walk GROUP BY node_id
+        ), selected AS (
+            SELECT node_id, depth FROM reached ORDER BY depth, node_id LIMIT $3
+        ), edges AS (
+            SELECT DISTINCT ON (LEAST(e.start_id, e.end_id), GREATEST(e.start_id, e.end_id))
+                e.id, e.start_id, e.end_id, e.properties
+            FROM "{graph_name}"."DIRECTED" e
+            JOIN selected s ON s.node_id = e.start_id
+            JOIN selected t ON t.node_id = e.end_id
+            ORDER BY LEAST(e.start_id, e.end_id), GREATEST(e.start_id, e.end_id), e.id
+        )
+        SELECT 'node' AS kind, s.depth, s.node_id AS sort_id, b.id::text AS id,
+               NULL::text AS start_id, NULL::text AS end_id, b.properties::text AS properties,
+               (SELECT count(*) FROM reached) AS total_nodes
+        FROM selected s
+        JOIN "{graph_name}"."base" b ON b.id = s.node_id
+        UNION ALL
+        SELECT 'edge', NULL, e.id, e.id::text, e.start_id::text, e.end_id::text,
+               e.properties::text, NULL
+        FROM edges e
+        ORDER BY kind DESC, depth, sort_id""",
     # DROP tables
     "drop_specifiy_table_workspace": """
         DELETE FROM {table_name} WHERE workspace=$1
        """,
 }
+
+
+# Unformatted templates are counted under their SQL_TEMPLATES key
+SQL_TEMPLATE_NAMES = {sql: name for name, sql in SQL_TEMPLATES.items()}